@@ -1,12 +1,16 @@
-from flask import Flask, request  # Add request import
+from flask import Flask, request, jsonify  # Add request import
 import os
 from flask_socketio import SocketIO, emit
 import traceback
-import threading  # Add this import
 
 # Upload endpoints functions
-from endpoints.upload_image import detect_endpoint
+from endpoints.upload_image import detect_endpoint, detect_endpoint_bin
 from endpoints.test import test
+from model import batcher, uploader
+from kafka_producer import producer_stats
+
+# bounded pool of inference workers
+from inference_pool import InferencePool
 
 # init flask api for normal backend endpoints
 app = Flask(__name__)
@@ -20,6 +24,16 @@ socketio = SocketIO(app, cors_allowed_origins="*")
 def root():
     return test()
 
+# Inference queue depth and rejection counts (used to size the servers)
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify({
+        **inference_pool.stats(),
+        "batching": batcher.stats(),
+        "uploads": uploader.stats(),
+        "kafka": producer_stats()
+    })
+
 ## ----------------- websocket for streaming -------------------------------------------
 # Global error handler
 @socketio.on_error_default
@@ -40,11 +54,11 @@ def handle_connect():
 def handle_disconnect():
     print('❌ Client disconnected!')
 
-def process_in_background(data, sid):
+def process_in_background(sid, endpoint, *args):
     """Process image in background thread (keeps your detect_endpoint unchanged)"""
     try:
-        # Call your EXACT same detect_endpoint function
-        res = detect_endpoint(data)
+        # Call the endpoint of the event (base64 or binary)
+        res = endpoint(*args)
         
         # Use socketio.emit (thread-safe) to send response
         socketio.emit("response", res, room=sid)
@@ -56,20 +70,24 @@ def process_in_background(data, sid):
             'error': str(e)
         }, room=sid)
 
-# connection between the flutter app
-@socketio.on("stream_image")
-def stream(data):
+# fixed number of workers instead of one thread per frame
+inference_pool = InferencePool(process_in_background)
+
+def queue_frame(endpoint, *args):
+    """Give the frame to the inference workers or tell the client we are busy"""
     try:
         # Get client session ID
         sid = request.sid
         
-        # Create a background thread for processing
-        thread = threading.Thread(
-            target=process_in_background,
-            args=(data, sid),
-            daemon=True  # Thread won't block app shutdown
-        )
-        thread.start()
+        # Queue the frame for the inference workers
+        if not inference_pool.submit(sid, endpoint, *args):
+            # Queue is full -> drop the frame and tell the client to slow down
+            emit("busy", {
+                "status": "dropped",
+                "queue_depth": inference_pool.queue.qsize(),
+                "queue_size": inference_pool.max_queue
+            })
+            return
         
         # Optional: Send immediate acknowledgement
         emit("ack", {"status": "processing"})
@@ -81,6 +99,29 @@ def stream(data):
             'error': str(e)
         })
 
+# connection between the flutter app
+# base64 image inside the JSON (old app builds)
+@socketio.on("stream_image")
+def stream(data):
+    queue_frame(detect_endpoint, data)
+
+# binary JPG attachment + metadata {lon, lat, ppm, client_time}
+@socketio.on("stream_image_bin")
+def stream_bin(meta, image=None):
+    # also accept everything in one dict {'img': <bytes>, 'lon': ...}
+    if image is None and isinstance(meta, dict):
+        meta = dict(meta)
+        image = meta.pop('img', None)
+
+    # malformed payload: answer the client instead of failing in the socket handler
+    if not isinstance(meta, dict) or not isinstance(image, (bytes, bytearray, memoryview)):
+        emit('response', {
+            'status': 'error',
+            'error': "stream_image_bin expects a metadata dict and the JPG bytes (attachment or 'img')"
+        })
+        return
+    queue_frame(detect_endpoint_bin, meta, image)
+
 # ---------------------------------------------------------------------------------------------
 if __name__ == '__main__':
     socketio.run(app, host='0.0.0.0', port=5000)
\ No newline at end of file
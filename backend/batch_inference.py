@@ -0,0 +1,109 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from dotenv import load_dotenv
+
+load_dotenv() # load vars from .env
+
+# Max frames in one model call and max time to wait for the batch to fill
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 8))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", 10))
+# Max time a caller waits for its result (the inference worker is freed after it)
+BATCH_TIMEOUT_S = float(os.getenv("BATCH_TIMEOUT_S", 30))
+
+class BatchInference:
+    """
+    Collects frames coming from many sockets and runs them through
+    the model in one call.
+
+    Every caller of predict() blocks on its own future, so each result
+    goes back to the worker (and the sid) that sent the frame. A batch is
+    flushed when it reaches max_batch_size or after max_wait_ms, whichever
+    comes first. Only the batching thread touches the model.
+    """
+
+    def __init__(self, predict_batch, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS, timeout=BATCH_TIMEOUT_S):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+        self.queue = queue.Queue()
+
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.frames = 0
+        self.timeouts = 0
+
+        self._thread = threading.Thread(target=self._loop, name="batch-inference", daemon=True)
+        self._thread.start()
+
+    def predict(self, image, timeout=None):
+        """
+        Run one image through the model (batched with other callers).
+        Raises TimeoutError if there is no result after timeout seconds.
+        """
+        future = Future()
+        self.queue.put((image, future))
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeout:
+            # not run yet: the batching thread skips it
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError("Inference timed out") from None
+
+    def _collect(self):
+        # block until the first frame arrives, then wait a few ms for more
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _loop(self):
+        while True:
+            # frames whose caller timed out are not run
+            batch = [(image, future) for image, future in self._collect() if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            images = [image for image, _ in batch]
+
+            try:
+                results = list(self.predict_batch(images))
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Model returned {len(results)} results for {len(batch)} images")
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                # no caller is left waiting forever
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            with self._lock:
+                self.batches += 1
+                self.frames += len(batch)
+
+    def stats(self):
+        """Batching counters"""
+        with self._lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "pending": self.queue.qsize(),
+                "batches": self.batches,
+                "frames": self.frames,
+                "timeouts": self.timeouts,
+                "avg_batch_size": round(self.frames / self.batches, 2) if self.batches else 0,
+            }
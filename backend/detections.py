@@ -0,0 +1,59 @@
+import numpy as np
+
+class Detections:
+  """
+  Columnar detections of one frame.
+
+  One array per field (class id, confidence, box) instead of one dict
+  per box. to_list() gives back the same JSON shape the app, Kafka and
+  Spark already expect.
+  """
+
+  def __init__(self, cls_ids, confidence, xyxy, names):
+    self.cls_ids = np.asarray(cls_ids, dtype=np.int64).reshape(-1)
+    self.confidence = np.asarray(confidence, dtype=np.float32).reshape(-1)
+    self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+    self.names = names
+
+  @classmethod
+  def empty(cls, names):
+    return cls(np.empty(0), np.empty(0), np.empty((0, 4)), names)
+
+  @classmethod
+  def from_result(cls, result, names):
+    """Build from one ultralytics Results object"""
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+      return cls.empty(names)
+
+    # one device -> host copy per field instead of three per box
+    return cls(
+      boxes.cls.cpu().numpy(),
+      boxes.conf.cpu().numpy(),
+      boxes.xyxy.cpu().numpy(),
+      names
+    )
+
+  def __len__(self):
+    return len(self.cls_ids)
+
+  @property
+  def labels(self):
+    """Class names of the boxes"""
+    return [self.names[i] for i in self.cls_ids.tolist()]
+
+  def to_list(self):
+    """Same shape as before: list of {label, confidence, x1, y1, x2, y2}"""
+    x1, y1, x2, y2 = self.xyxy.T.tolist()
+
+    return [
+      {
+        "label": label,
+        "confidence": conf,
+        "x1": a,
+        "y1": b,
+        "x2": c,
+        "y2": d,
+      }
+      for label, conf, a, b, c, d in zip(self.labels, self.confidence.tolist(), x1, y1, x2, y2)
+    ]
@@ -1,11 +1,44 @@
 from flask import request, jsonify
 from model import detect
-import numpy as np
-from kafka_producer import kafka_producer
+from kafka_producer import send_detection
 from datetime import datetime
-import json
 import base64
 
+def process_image(image_bytes, data):
+  # image_bytes -> the original JPG sent by the phone
+  # data -> metadata (lon, lat, ppm and optional client_time)
+
+  # prepare other metadata
+  lon = float(data["lon"])
+  lat = float(data["lat"])
+  ppm = float(data["ppm"])
+  time = datetime.now().isoformat()
+
+  # list of cracks and its confidence
+  # lon, lat, time to be identifier for the image name
+  # that will be saved to the data lake
+  labels_list = detect(image_bytes, lon, lat, time).to_list()
+
+  # Organize the data
+  res = {
+    "lon": lon,
+    "lat": lat,
+    "time": time,
+    "labels": labels_list,
+    "ppm": ppm, # pixel per meter
+    "image": f"{lon}_{lat}_{time}.jpg" # image name in azure datalake in folder /raw
+  }
+
+  # time the phone took the image (binary protocol)
+  if data.get("client_time") is not None:
+    res["client_time"] = data["client_time"]
+
+  # Send data to kafka topic (batched, compressed, keyed by location)
+  send_detection(res)
+
+  return res
+
+# Old app builds: base64 image inside the JSON
 def detect_endpoint(data):
   
   try:
@@ -16,38 +49,22 @@ def detect_endpoint(data):
     if base64_string.startswith('data:image'):
       base64_string = base64_string.split(',')[1]
         
-    # 1. Decode base64 to bytes
+    # Decode base64 to bytes (the original JPG, also used for the upload)
     image_bytes = base64.b64decode(base64_string)
-        
-    # 2. Convert bytes to numpy array
-    nparr = np.frombuffer(image_bytes, np.uint8)
-
-    # prepare other metadata
-    lon = float(data["lon"])
-    lat = float(data["lat"])
-    ppm = float(data["ppm"])
-    time = datetime.now().isoformat()
-
-    # list of cracks and its confidence
-    # lon, lat, time to be identifier for the image name
-    # that will be saved to the data lake
-    labels_list = detect(nparr, lon, lat, time)
-
-    # Organize the data
-    res = {
-      "lon": lon,
-      "lat": lat,
-      "time": time,
-      "labels": labels_list,
-      "ppm": ppm, # pixel per meter
-      "image": f"{lon}_{lat}_{time}.jpg" # image name in azure datalake in folder /raw
-    }
-
-    # Send data to kafka topic
-    kafka_producer.send('test', json.dumps(res))
 
     # Response to the user
-    return res
+    return process_image(image_bytes, data)
+  
+  except Exception as e:
+    return {'error': str(e)}
+
+# New app builds: raw JPG as a binary attachment (no base64)
+def detect_endpoint_bin(meta, image):
   
+  try:
+    # the attachment the socket.io handler received (bytes, bytearray or memoryview)
+    # is decoded and uploaded as it is, never copied
+    return process_image(image, meta)
+
   except Exception as e:
-    return {'error': str(e)}
\ No newline at end of file
+    return {'error': str(e)}
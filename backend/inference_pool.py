@@ -0,0 +1,87 @@
+import os
+import queue
+import threading
+import traceback
+from dotenv import load_dotenv
+
+load_dotenv() # load vars from .env
+
+# Defaults can be changed from .env without touching the code
+# workers mostly wait on the batcher, so keep them >= BATCH_MAX_SIZE
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 8))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", 16))
+
+class InferencePool:
+    """
+    Fixed number of worker threads pulling frames from a bounded queue.
+
+    Instead of one thread per frame, frames wait in the queue until a worker
+    is free. When the queue is full the frame is rejected right away so the
+    caller can tell the client to slow down (backpressure).
+    """
+
+    def __init__(self, handler, workers=INFERENCE_WORKERS, max_queue=INFERENCE_QUEUE_SIZE):
+        self.handler = handler
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue = queue.Queue(maxsize=max_queue)
+
+        # counters used to size the servers from real load
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.processed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.busy_workers = 0
+
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"inference-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, *args):
+        """Queue a job, returns False if the queue is full (job dropped)"""
+        try:
+            self.queue.put_nowait(args)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def _worker(self):
+        while True:
+            args = self.queue.get()
+            with self._lock:
+                self.busy_workers += 1
+            try:
+                self.handler(*args)
+                with self._lock:
+                    self.processed += 1
+            except Exception as e:
+                print(f"❌ Inference worker error: {e}")
+                traceback.print_exc()
+                with self._lock:
+                    self.failed += 1
+            finally:
+                with self._lock:
+                    self.busy_workers -= 1
+                self.queue.task_done()
+
+    def stats(self):
+        """Current queue depth and counters"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "busy_workers": self.busy_workers,
+                "queue_depth": self.queue.qsize(),
+                "queue_size": self.max_queue,
+                "submitted": self.submitted,
+                "processed": self.processed,
+                "rejected": self.rejected,
+                "failed": self.failed,
+            }
@@ -0,0 +1,51 @@
+import json
+import os
+from dotenv import load_dotenv
+
+load_dotenv() # load vars from .env
+
+# Message encoding and key used by the kafka producer
+# (kept apart from kafka_producer.py so it can be used without a broker)
+KAFKA_ENCODING = os.getenv("KAFKA_ENCODING", "json")        # json or msgpack (scripts/spark.py reads both)
+GEOHASH_PRECISION = int(os.getenv("GEOHASH_PRECISION", 6))  # ~1.2km x 0.6km cells
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def geohash(lat, lon, precision=GEOHASH_PRECISION):
+  """Geohash of a point, used as message key so a road area stays on one partition"""
+  lat_range = [-90.0, 90.0]
+  lon_range = [-180.0, 180.0]
+  geohash_chars = []
+  ch = 0
+  bit = 0
+  even = True
+
+  while len(geohash_chars) < precision:
+    # even bits split longitude, odd bits split latitude
+    value, value_range = (lon, lon_range) if even else (lat, lat_range)
+    mid = (value_range[0] + value_range[1]) / 2
+    if value > mid:
+      ch |= 1 << (4 - bit)
+      value_range[0] = mid
+    else:
+      value_range[1] = mid
+    even = not even
+
+    if bit < 4:
+      bit += 1
+    else:
+      geohash_chars.append(_BASE32[ch])
+      ch = 0
+      bit = 0
+
+  return "".join(geohash_chars)
+
+def encode_message(res, encoding=KAFKA_ENCODING):
+  """Detection dict -> bytes (JSON or compact msgpack)"""
+  if encoding == "json":
+    return json.dumps(res).encode("utf-8")
+  elif encoding == "msgpack":
+    import msgpack
+    return msgpack.packb(res, use_bin_type=True)
+  else:
+    raise ValueError(f"Unsupported kafka encoding: {encoding}. Available encodings: ['json', 'msgpack']")
@@ -1,9 +1,70 @@
 from kafka import KafkaProducer
+from kafka import codec
+from dotenv import load_dotenv
+from kafka_codec import geohash, encode_message
+import threading
+import os
+
+load_dotenv() # load vars from .env
+
+# Producer settings (can be changed from .env) ---------------------------------------------------
+KAFKA_BOOTSTRAP_SERVERS = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:29092").split(",")
+KAFKA_TOPIC = os.getenv("KAFKA_TOPIC", "test")
+KAFKA_LINGER_MS = int(os.getenv("KAFKA_LINGER_MS", 20))          # wait a bit to fill batches
+KAFKA_BATCH_SIZE = int(os.getenv("KAFKA_BATCH_SIZE", 64 * 1024))  # bytes per partition batch
+KAFKA_COMPRESSION = os.getenv("KAFKA_COMPRESSION", "lz4") or None # lz4, zstd, gzip, snappy or empty
+
+# fail here with the package to install instead of inside KafkaProducer
+_codecs = {"gzip": (codec.has_gzip, "built in"), "lz4": (codec.has_lz4, "lz4"),
+           "zstd": (codec.has_zstd, "zstandard"), "snappy": (codec.has_snappy, "python-snappy")}
+if KAFKA_COMPRESSION is not None:
+  if KAFKA_COMPRESSION not in _codecs:
+    raise ValueError(f"Unsupported KAFKA_COMPRESSION: {KAFKA_COMPRESSION}. Available: {list(_codecs)} or empty")
+  available, package = _codecs[KAFKA_COMPRESSION]
+  if not available():
+    raise ValueError(f"KAFKA_COMPRESSION={KAFKA_COMPRESSION} needs the '{package}' package (pip install {package})")
+
+def _serialize(v):
+  # messages from send_detection are already encoded
+  if isinstance(v, (bytes, bytearray)):
+    return v
+  return v.encode('utf-8') # must for encoding (will give error if removed)
 
 # Creating Kafka Producer to push messages to Kafka Topic ---------------------------------------------
 kafka_producer = KafkaProducer(
-  bootstrap_servers=['localhost:29092'],
-  value_serializer=lambda v: v.encode('utf-8'), # must for encoding (will give error if removed)
+  bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
+  value_serializer=_serialize,
+  key_serializer=lambda k: k.encode('utf-8') if k is not None else None,
+  linger_ms=KAFKA_LINGER_MS,
+  batch_size=KAFKA_BATCH_SIZE,
+  compression_type=KAFKA_COMPRESSION,
   request_timeout_ms=5000,
   retries=3
-)
\ No newline at end of file
+)
+
+# Delivery counters (callbacks run on the producer's network thread)
+_lock = threading.Lock()
+delivery_stats = {"sent": 0, "delivered": 0, "failed": 0}
+
+def _on_delivered(metadata):
+  with _lock:
+    delivery_stats["delivered"] += 1
+
+def _on_failed(exc):
+  with _lock:
+    delivery_stats["failed"] += 1
+  print(f"❌ Kafka delivery failed: {exc}")
+
+def send_detection(res, topic=KAFKA_TOPIC, producer=kafka_producer):
+  """Send one detection without blocking, keyed by the geohash of its location"""
+  key = geohash(res["lat"], res["lon"])
+  future = producer.send(topic, key=key, value=encode_message(res))
+  future.add_callback(_on_delivered)
+  future.add_errback(_on_failed)
+
+  with _lock:
+    delivery_stats["sent"] += 1
+
+def producer_stats():
+  with _lock:
+    return dict(delivery_stats)
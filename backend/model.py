@@ -1,43 +1,45 @@
 import cv2
+import os
 import numpy as np
 from ultralytics import YOLO
-from upload_to_datalake import upload_to_datalake
-from upload_to_osb import upload_to_s3_compatible
+from uploader import Uploader
+from batch_inference import BatchInference
+from detections import Detections
 
 # Load the model (Yolo v8s) fine tuned version on EGY_PDD dataset
 model = YOLO("../models/fine_tunning/runs/main_trainging/yolov8s/weights/best.pt")
 
-def detect(nparr, lon, lat, time):
+# Run many frames in one predict call (one result per frame, same order)
+def predict_batch(images):
+  return model.predict(source=images, conf=0.25, save=False)
+
+# frames from all connected phones go through this batcher
+batcher = BatchInference(predict_batch)
+
+# Images with cracks are uploaded in the background
+# Storage is chosen with UPLOAD_BACKEND in .env (datalake, obs or local)
+uploader = Uploader()
+
+# Upload the image with the boxes drawn on it instead of the original
+# (only this needs a JPG re-encode)
+UPLOAD_ANNOTATED = os.getenv("UPLOAD_ANNOTATED", "false").lower() == "true"
+
+def detect(image_bytes, lon, lat, time):
+  # Bytes -> numpy array without copying (the original JPG stays in image_bytes)
+  nparr = np.frombuffer(image_bytes, np.uint8)
+
   # Decode the image using OpenCV
   image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
 
-  # Run inference on a folder
-  results = model.predict(source=image, conf=0.25, save=False)
-
-  # to check if any object was detected
-  labels = []
-
-  # Iterate through results
-  for result in results:
-      boxes = result.boxes  # Boxes object
-
-      # Convert to CPU and numpy for easier access
-      for box in boxes:
-          cls_id = int(box.cls.cpu().numpy()[0])        # Class ID
-          conf = float(box.conf.cpu().numpy()[0])        # Confidence
-          xyxy = box.xyxy.cpu().numpy()[0]               # Bounding box (x1, y1, x2, y2)
-
-          # Get class name from model.names dictionary
-          class_name = model.names[cls_id]
-
-          labels.append({
-            "label": class_name,
-            "confidence": float(conf),
-            "x1": float(xyxy[0]),
-            "y1": float(xyxy[1]),
-            "x2": float(xyxy[2]),
-            "y2": float(xyxy[3]),
-          })
+  # a broken frame must not fail the whole batch
+  if image is None:
+    raise ValueError("Could not decode image")
+
+  # Run inference (batched with frames from other clients)
+  result = batcher.predict(image)
+
+  # boxes as columns (class ids, confidences, xyxy) pulled once per frame
+  labels = Detections.from_result(result, model.names)
   
   # if there is labels Save processed image with labels 
   # Will store in Azure data lake in the future
@@ -46,13 +48,14 @@ def detect(nparr, lon, lat, time):
     # For local testing only
     # cv2.imwrite('./processed/output.jpg', image)
 
-    # Successfully working
-    # If you want to push images that have cracks to Azure Data Lake
-    # Just uncomment on real prodction or simple tests to avoid wasting the free plan
-    upload_to_datalake(image, f'raw/{lon}_{lat}_{time}.jpg')
-
-    # If you want to push images that have cracks to OBS
-    # upload_to_s3_compatible(image, f'raw/{lon}_{lat}_{time}.jpg')
+    # Push images that have cracks to the storage (Azure Data Lake / OBS)
+    # without waiting for the upload
+    if UPLOAD_ANNOTATED:
+      # boxes drawn by ultralytics, encoded to JPG in the upload worker
+      uploader.submit(result.plot(), f'raw/{lon}_{lat}_{time}.jpg')
+    else:
+      # the phone's original JPG bytes, no decode/encode round trip
+      uploader.submit(image_bytes, f'raw/{lon}_{lat}_{time}.jpg')
 
-  # Return whether any labels were detected
+  # Return detections (use .to_list() for the JSON shape)
   return labels
\ No newline at end of file
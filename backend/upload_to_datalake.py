@@ -17,6 +17,17 @@ file_system_name = os.getenv("file_system_name")
 service_client = DataLakeServiceClient.from_connection_string(connection_string)
 file_system_client = service_client.get_file_system_client(file_system=file_system_name)
 
+def upload_bytes_to_datalake(data, file_path_in_datalake, client=file_system_client):
+    # Raises on failure so the background uploader can retry
+    byte_stream = io.BytesIO(data)
+
+    # Get a file client and upload the data
+    file_client = client.get_file_client(file_path_in_datalake)
+
+    # The upload_data method handles the upload of the byte stream
+    file_client.upload_data(data=byte_stream, overwrite=True)
+    print(f"Image successfully uploaded to Azure Data Lake at: {file_path_in_datalake}")
+
 def upload_to_datalake(image, file_path_in_datalake, file_system_name=file_system_name, connection_string=connection_string):
     try:
         # Convert the OpenCV image to bytes
@@ -24,14 +35,7 @@ def upload_to_datalake(image, file_path_in_datalake, file_system_name=file_syste
         if not is_success:
             raise ValueError("Could not encode image to JPG format")
 
-        byte_stream = io.BytesIO(buffer)
-
-        # Get a file client and upload the data
-        file_client = file_system_client.get_file_client(file_path_in_datalake)
-
-        # The upload_data method handles the upload of the byte stream
-        file_client.upload_data(data=byte_stream, overwrite=True)
-        print(f"Image successfully uploaded to Azure Data Lake at: {file_path_in_datalake}")
+        upload_bytes_to_datalake(buffer.tobytes(), file_path_in_datalake)
         
     except Exception as ex:
         print('Exception:')
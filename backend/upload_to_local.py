@@ -0,0 +1,20 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Local folder used instead of the cloud (for testing)
+LOCAL_UPLOAD_DIR = os.getenv("LOCAL_UPLOAD_DIR", "./uploads")
+
+def upload_to_local(data, file_path, root=LOCAL_UPLOAD_DIR):
+    # same relative path as the cloud (e.g. raw/<lon>_<lat>_<time>.jpg)
+    local_path = os.path.join(root, file_path)
+    os.makedirs(os.path.dirname(local_path), exist_ok=True)
+
+    # write to a temp file first so a crash never leaves half an image
+    tmp_path = local_path + ".part"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, local_path)
+
+    print(f"Image successfully saved locally at: {local_path}")
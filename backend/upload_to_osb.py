@@ -25,20 +25,22 @@ s3 = boto3.client(
     )
 )
 
+def upload_bytes_to_s3_compatible(data, object_key, bucket=BUCKET, client=s3):
+    # Raises on failure so the background uploader can retry
+    client.upload_fileobj(
+        io.BytesIO(data),
+        bucket,
+        object_key,
+        ExtraArgs={"ContentType": "image/jpeg"}
+    )
+    print(f"✅ Uploaded {object_key} to {bucket} via S3-compatible endpoint")
+
 def upload_to_s3_compatible(image, object_key, bucket=BUCKET, client=s3):
     ok, buffer = cv2.imencode(".jpg", image)
     if not ok:
         raise ValueError("Could not encode image to JPG")
 
-    data = io.BytesIO(buffer.tobytes())
-
     try:
-        client.upload_fileobj(
-            data,
-            bucket,
-            object_key,
-            ExtraArgs={"ContentType": "image/jpeg"}
-        )
-        print(f"✅ Uploaded {object_key} to {bucket} via S3-compatible endpoint")
+        upload_bytes_to_s3_compatible(buffer.tobytes(), object_key, bucket, client)
     except ClientError as e:
         print(f"❌ Upload failed: {e}")
\ No newline at end of file
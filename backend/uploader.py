@@ -0,0 +1,257 @@
+import os
+import json
+import uuid
+import time
+import queue
+import threading
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv() # load vars from .env
+
+# Where images go: datalake (Azure), obs (Huawei) or local (testing)
+UPLOAD_BACKEND = os.getenv("UPLOAD_BACKEND", "datalake")
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 4))
+UPLOAD_QUEUE_SIZE = int(os.getenv("UPLOAD_QUEUE_SIZE", 256))
+UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", 3))
+UPLOAD_BACKOFF_S = float(os.getenv("UPLOAD_BACKOFF_S", 0.5))
+
+# Images that could not be uploaded are kept here and retried later
+UPLOAD_JOURNAL_DIR = os.getenv("UPLOAD_JOURNAL_DIR", "./upload_journal")
+UPLOAD_JOURNAL_REPLAY_S = float(os.getenv("UPLOAD_JOURNAL_REPLAY_S", 30))
+# images beyond this size are dropped instead of journaled (long storage outage)
+UPLOAD_JOURNAL_MAX_MB = float(os.getenv("UPLOAD_JOURNAL_MAX_MB", 2000))
+# files of an entry that was never completed (crash while spilling) are removed after this
+JOURNAL_ORPHAN_AGE_S = 60
+
+def get_backend(name=UPLOAD_BACKEND):
+    """upload(data: bytes, path: str) function of the chosen storage"""
+    # imported here so only the chosen backend needs credentials
+    if name == "datalake":
+        from upload_to_datalake import upload_bytes_to_datalake
+        return upload_bytes_to_datalake
+    elif name == "obs":
+        from upload_to_osb import upload_bytes_to_s3_compatible
+        return upload_bytes_to_s3_compatible
+    elif name == "local":
+        from upload_to_local import upload_to_local
+        return upload_to_local
+    else:
+        raise ValueError(f"Unsupported upload backend: {name}. Available backends: ['datalake', 'obs', 'local']")
+
+def to_jpg_bytes(image):
+    """Encoded bytes are sent as they are, decoded images are encoded to JPG"""
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return image
+    if isinstance(image, np.ndarray) and image.ndim == 1:
+        # still encoded (e.g. np.frombuffer of the JPG)
+        return image
+    ok, buffer = cv2.imencode(".jpg", image)
+    if not ok:
+        raise ValueError("Could not encode image to JPG format")
+    return buffer
+
+class Uploader:
+    """
+    Background image uploader.
+
+    submit() never blocks inference: jobs go to a bounded queue served by a
+    pool of workers that retry with exponential backoff. When the queue is
+    full or all retries fail the image is written to a journal folder on
+    disk and uploaded again later, so a storage outage does not lose images.
+    """
+
+    def __init__(self, upload=None, workers=UPLOAD_WORKERS, max_queue=UPLOAD_QUEUE_SIZE,
+                 retries=UPLOAD_RETRIES, backoff=UPLOAD_BACKOFF_S,
+                 journal_dir=UPLOAD_JOURNAL_DIR, replay_interval=UPLOAD_JOURNAL_REPLAY_S,
+                 journal_max_mb=UPLOAD_JOURNAL_MAX_MB):
+        self.upload = upload if upload is not None else get_backend()
+        self.retries = retries
+        self.backoff = backoff
+        self.journal_dir = journal_dir
+        self.replay_interval = replay_interval
+        self.journal_max_bytes = journal_max_mb * 1e6
+        self.queue = queue.Queue(maxsize=max_queue)
+        # unreadable entries are moved here instead of blocking the replay
+        self.bad_dir = os.path.join(journal_dir, "bad")
+        os.makedirs(self.bad_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._journal_lock = threading.Lock()
+        self.submitted = 0
+        self.uploaded = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.bad = 0
+        self.journal_bytes = sum(
+            os.path.getsize(os.path.join(journal_dir, f)) for f in os.listdir(journal_dir) if f.endswith(".jpg")
+        )
+
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"uploader-{i}", daemon=True).start()
+
+        # also picks up images left in the journal by a previous run
+        threading.Thread(target=self._replay_loop, name="uploader-journal", daemon=True).start()
+
+    def submit(self, image, path):
+        """Queue an image (bytes or OpenCV image) for upload to path"""
+        with self._lock:
+            self.submitted += 1
+        try:
+            self.queue.put_nowait((image, path))
+        except queue.Full:
+            # do not wait for the storage, keep it on disk for later
+            self._spill(image, path)
+
+    def _worker(self):
+        while True:
+            image, path = self.queue.get()
+            try:
+                data = to_jpg_bytes(image)
+                if self._upload_with_retry(data, path):
+                    with self._lock:
+                        self.uploaded += 1
+                else:
+                    self._spill(data, path)
+            except Exception as e:
+                print(f"❌ Upload worker error ({path}): {e}")
+            finally:
+                self.queue.task_done()
+
+    def _upload_with_retry(self, data, path):
+        for attempt in range(self.retries + 1):
+            try:
+                self.upload(data, path)
+                return True
+            except Exception as e:
+                print(f"❌ Upload failed ({path}) attempt {attempt + 1}/{self.retries + 1}: {e}")
+                if attempt < self.retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+        return False
+
+    # ------------------------- journal (spill to disk) -------------------------
+    def _spill(self, image, path):
+        data = to_jpg_bytes(image)
+        size = memoryview(data).nbytes
+        with self._lock:
+            if self.journal_bytes + size > self.journal_max_bytes:
+                # journal full: the disk must not fill up while the storage is down
+                self.dropped += 1
+                print(f"❌ Upload journal full, image dropped: {path}")
+                return
+            self.journal_bytes += size
+
+        # time first so replay keeps the original order
+        name = f"{time.time_ns()}_{uuid.uuid4().hex}"
+        meta_path = os.path.join(self.journal_dir, f"{name}.json")
+
+        # image first, then the metadata file that marks the entry complete
+        # (written to a temporary file then renamed, so it is never half written)
+        with open(os.path.join(self.journal_dir, f"{name}.jpg"), "wb") as f:
+            f.write(data)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump({"path": path}, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+        with self._lock:
+            self.spilled += 1
+        print(f"💾 Upload journaled for later: {path}")
+
+    def _move_to_bad(self, *paths):
+        for p in paths:
+            if os.path.exists(p):
+                os.replace(p, os.path.join(self.bad_dir, os.path.basename(p)))
+
+    def _remove_orphans(self, entries):
+        """Images (and metadata temporary files) of entries that were never completed"""
+        names = set(entries)
+        now = time.time()
+        for entry in entries:
+            stem, ext = os.path.splitext(entry)
+            orphan = (ext == ".jpg" and f"{stem}.json" not in names) or entry.endswith(".json.tmp")
+            if not orphan:
+                continue
+            file_path = os.path.join(self.journal_dir, entry)
+            try:
+                # recent ones may still be being written by _spill
+                if now - os.path.getmtime(file_path) < JOURNAL_ORPHAN_AGE_S:
+                    continue
+                size = os.path.getsize(file_path) if ext == ".jpg" else 0
+                os.remove(file_path)
+            except OSError:
+                continue
+            with self._lock:
+                self.journal_bytes -= size
+            print(f"🗑️ Orphan journal file removed: {entry}")
+
+    def replay_journal(self):
+        """Try to upload everything in the journal once, returns number uploaded"""
+        count = 0
+        with self._journal_lock:
+            entries = sorted(os.listdir(self.journal_dir))
+            self._remove_orphans(entries)
+
+            for entry in entries:
+                if not entry.endswith(".json"):
+                    continue
+
+                meta_path = os.path.join(self.journal_dir, entry)
+                image_path = meta_path[:-len(".json")] + ".jpg"
+                try:
+                    with open(meta_path) as f:
+                        path = json.load(f)["path"]
+                    with open(image_path, "rb") as f:
+                        data = f.read()
+                except Exception as e:
+                    # corrupt or incomplete entry: set aside, the others are still replayed
+                    print(f"❌ Bad journal entry moved to {self.bad_dir} ({entry}): {e}")
+                    size = os.path.getsize(image_path) if os.path.exists(image_path) else 0
+                    self._move_to_bad(meta_path, image_path)
+                    with self._lock:
+                        self.bad += 1
+                        self.journal_bytes -= size
+                    continue
+
+                try:
+                    self.upload(data, path)
+                except Exception as e:
+                    # storage still down, try again in the next round
+                    print(f"❌ Journal replay failed ({entry}): {e}")
+                    break
+
+                os.remove(meta_path)
+                os.remove(image_path)
+                count += 1
+                with self._lock:
+                    self.journal_bytes -= len(data)
+
+        with self._lock:
+            self.replayed += count
+            self.uploaded += count
+        return count
+
+    def _replay_loop(self):
+        while True:
+            try:
+                self.replay_journal()
+            except Exception as e:
+                print(f"❌ Journal replay error: {e}")
+            time.sleep(self.replay_interval)
+
+    def stats(self):
+        """Upload counters"""
+        journaled = len([f for f in os.listdir(self.journal_dir) if f.endswith(".json")])
+        with self._lock:
+            return {
+                "queue_depth": self.queue.qsize(),
+                "submitted": self.submitted,
+                "uploaded": self.uploaded,
+                "spilled": self.spilled,
+                "replayed": self.replayed,
+                "dropped": self.dropped,
+                "bad": self.bad,
+                "journaled": journaled,
+                "journal_mb": round(self.journal_bytes / 1e6, 2),
+            }
@@ -1,5 +1,6 @@
 import 'package:socket_io_client/socket_io_client.dart' as IO;
 import 'dart:async';
+import 'dart:typed_data';
 
 class SocketService {
   IO.Socket? _socket;
@@ -137,6 +138,30 @@ void clearBuffers() {
     }
   }
 
+  // Send raw JPG bytes as a binary attachment (no base64, ~33% smaller)
+  void sendImageBytes(Uint8List imageBytes, double lon, double lat, double ppm) {
+    if (!isConnected || _socket == null) {
+      print('Not connected to server');
+      return;
+    }
+
+    try {
+      Map<String, dynamic> meta = {
+        'lon': lon,
+        'lat': lat,
+        'ppm': ppm,
+        'client_time': DateTime.now().toIso8601String(),
+      };
+
+      // list -> two event arguments (metadata, image)
+      _socket!.emit('stream_image_bin', [meta, imageBytes]);
+      print('📤 Sent binary image: ${imageBytes.length} bytes');
+
+    } catch (e) {
+      print('Error sending image: $e');
+    }
+  }
+
   void disconnect() {
     _socket?.disconnect();
     _socket = null;
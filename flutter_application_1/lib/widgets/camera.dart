@@ -1,6 +1,6 @@
 import 'dart:async';
-import 'dart:convert';
 import 'dart:io';
+import 'dart:typed_data';
 import 'package:flutter/material.dart';
 import 'package:camera/camera.dart';
 import 'package:flutter_application_1/widgets/settings.dart';
@@ -340,34 +340,26 @@ void dispose() {
     final settingsProvider = Provider.of<SettingsProvider>(context, listen: false);
 
     // ✅ FIXED: Read image bytes with file size check
-    List<int> imageBytes = await tempImageFile.readAsBytes();
+    Uint8List imageBytes = await tempImageFile.readAsBytes();
     
     // ✅ FIXED: Check file size and compress if too large
     if (imageBytes.length > 2 * 1024 * 1024) { // 2MB threshold
       print('📦 Image too large (${imageBytes.length ~/ 1024}KB), consider compression');
       // You could add image compression here if needed
     }
-    
-    String base64Image = base64Encode(imageBytes);
-    
-    // Clear the large byte array from memory immediately
-    imageBytes = [];
 
     setState(() {
       _uploadStatus = "🔄 Sending via WebSocket...";
     });
 
-    // ✅ Send via WebSocket instead of HTTP
-    _socketService.sendImageData(
-      base64Image, // Base64 string without prefix
+    // ✅ Send raw JPG bytes via WebSocket (binary, no base64)
+    _socketService.sendImageBytes(
+      imageBytes,
       position.longitude,
       position.latitude,
       settingsProvider.ppm,
     );
 
-    // ✅ FIXED: Clear base64 string from memory after sending
-    base64Image = "";
-
     setState(() {
       _uploadStatus = "✅ Sent via WebSocket!";
       _imageName = "${position.longitude.toStringAsFixed(4)}_${position.latitude.toStringAsFixed(4)}_${DateTime.now().millisecondsSinceEpoch}.jpg";
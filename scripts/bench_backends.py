@@ -0,0 +1,121 @@
+# Benchmark of the dashboard backends on a synthetic crack table (10M cracks by default)
+#   pandas: what the Cassandra backend does, all the filtered cracks are fetched
+#           (here read from parquet, a lower bound of the cassandra transfer) and
+#           grouped / turned into PCI in pandas (streamlit/pci.py)
+#   duckdb: streamlit/duck.py, filters, joins, group-bys and PCI run as SQL
+# and checks that both give the same PCI.
+# Run from the scripts folder: python bench_backends.py [cracks]
+import sys
+import time
+import shutil
+import tempfile
+from datetime import date
+import duckdb
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+sys.path.append('../streamlit')
+
+from pci import pci_table
+from duck import DuckDB, pci_query
+from deduct_value_func import CRACK_TYPES
+
+# -------------------- SETTINGS --------------------
+CRACKS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+ROADS = 50_000
+DISTS = ['Muntazah', 'Sharq', 'Wasat', 'Gharb', 'Agamy', 'Amreya', 'Gomrok', 'Gonoub']
+FILTERS = {
+    'districts': ['Muntazah', 'Sharq'],
+    'confidence': 0.5,
+    'start_date': date(2025, 3, 1),
+    'end_date': date(2025, 5, 31),
+}
+# --------------------------------------------------
+
+def synthetic_cracks(path, n):
+    """n cracks over 2025 written as the snapshot (hive partitions dist / month)"""
+    labels = "[" + ", ".join(f"'{t}'" for t in CRACK_TYPES) + "]"
+    dists = "[" + ", ".join(f"'{d}'" for d in DISTS) + "]"
+    duckdb.sql(f"""
+        COPY (
+            SELECT *, strftime(timestamp, '%Y-%m') AS month FROM (
+                SELECT
+                    {dists}[1 + (hash(i, 1) % {len(DISTS)})::INTEGER] AS dist,
+                    TIMESTAMP '2025-01-01' + to_milliseconds((hash(i, 2) % 31536000000)::BIGINT) AS timestamp,
+                    uuid()::VARCHAR AS id,
+                    (hash(i, 3) % 1000000) / 1e6 AS confidence,
+                    'image_' || i || '.jpg' AS image,
+                    {labels}[1 + (hash(i, 4) % {len(CRACK_TYPES)})::INTEGER] AS label,
+                    31.2 + (hash(i, 5) % 100000) / 1e6 AS lat,
+                    30.0 + (hash(i, 6) % 100000) / 1e6 AS lon,
+                    (CASE WHEN hash(i, 7) % 2 = 0 THEN 100 ELSE 2500 END)::DOUBLE AS ppm,
+                    ((hash(i, 8) % {ROADS + 1})::BIGINT - 1) AS road_index,
+                    (hash(i, 9) % 640)::DOUBLE AS x1, (hash(i, 10) % 640)::DOUBLE AS x2,
+                    (hash(i, 11) % 640)::DOUBLE AS y1, (hash(i, 12) % 640)::DOUBLE AS y2
+                FROM range({n}) t(i)
+            )
+        ) TO '{path}' (FORMAT parquet, PARTITION_BY (dist, month))
+    """)
+
+def pandas_backend(path, filters, road_length):
+    """Filtered cracks fetched whole, then rollup and PCI in pandas"""
+    start = pd.Timestamp(filters['start_date'])
+    end = pd.Timestamp(filters['end_date']) + pd.Timedelta(hours=23, minutes=59, seconds=59)
+    data = ds.dataset(path, format='parquet', partitioning='hive').to_table(
+        filter=ds.field('dist').isin(filters['districts'])
+        & (ds.field('timestamp') >= pa.scalar(start.to_pydatetime(), type=pa.timestamp('us')))
+        & (ds.field('timestamp') <= pa.scalar(end.to_pydatetime(), type=pa.timestamp('us')))
+        & (ds.field('confidence') >= filters['confidence'])
+    ).to_pandas()
+    fetched = time.perf_counter()
+
+    area = (data['x2'] - data['x1']).abs() * (data['y2'] - data['y1']).abs() / (data['ppm'] * data['ppm'])
+    rollup = data[['road_index', 'label']].assign(cracks=1, area_m2=area)\
+        .groupby(['road_index', 'label'], as_index=False)[['cracks', 'area_m2']].sum()
+
+    cracks = data.loc[data['road_index'] != -1, ['x1', 'x2', 'y1', 'y2', 'ppm', 'label', 'road_index']]
+    cracks = cracks.assign(road_length=road_length.reindex(cracks['road_index'].to_numpy()).to_numpy())
+    pci = pci_table(cracks)
+    return len(data), fetched, rollup, pci
+
+tmp = tempfile.mkdtemp()
+path = f"{tmp}/crack"
+try:
+    start = time.perf_counter()
+    synthetic_cracks(path, CRACKS)
+    print(f"{CRACKS} synthetic cracks written in {time.perf_counter() - start:.1f}s")
+
+    rng = np.random.default_rng(0)
+    road_length = pd.Series(rng.uniform(5, 2000, ROADS))
+    roads = pd.DataFrame({'road_index': road_length.index.to_numpy(), 'length_m': road_length.to_numpy()})
+
+    start = time.perf_counter()
+    rows, fetched, pandas_rollup, pandas_pci = pandas_backend(path, FILTERS, road_length)
+    end = time.perf_counter()
+    fetch_s, pandas_s = fetched - start, end - fetched
+
+    backend = DuckDB(f"{path}/**/*.parquet", roads=roads)
+    start = time.perf_counter()
+    duckdb_rollup = backend.exec_rollup(FILTERS)
+    rollup_s = time.perf_counter() - start
+
+    where, params = backend.where(FILTERS, 'c.')
+    start = time.perf_counter()
+    duckdb_pci = backend.exec(pci_query(where), params)
+    pci_s = time.perf_counter() - start
+
+    duckdb_pci = duckdb_pci.sort_values('road_index').reset_index(drop=True)
+    same = np.array_equal(pandas_pci['road_index'].to_numpy(), duckdb_pci['road_index'].to_numpy()) \
+        and np.allclose(pandas_pci['pci'].to_numpy(), duckdb_pci['pci'].to_numpy(), atol=0.011) \
+        and len(pandas_rollup) == len(duckdb_rollup) \
+        and pandas_rollup['cracks'].sum() == duckdb_rollup['cracks'].sum()
+
+    print(f"{rows} cracks match the filters, {len(duckdb_pci)} roads")
+    print(f"{'backend':>8} {'fetch s':>8} {'rollup + pci s':>15} {'total s':>8}")
+    print(f"{'pandas':>8} {fetch_s:>8.2f} {pandas_s:>15.2f} {fetch_s + pandas_s:>8.2f}")
+    print(f"{'duckdb':>8} {'-':>8} {rollup_s + pci_s:>15.2f} {rollup_s + pci_s:>8.2f}")
+    print(f"speedup {(fetch_s + pandas_s) / (rollup_s + pci_s):.1f}x, same results: {same}")
+finally:
+    shutil.rmtree(tmp, ignore_errors=True)
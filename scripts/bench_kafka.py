@@ -0,0 +1,115 @@
+# Benchmark of the kafka message encoding and batch compression used by backend/kafka_producer.py
+# A local stand-in of the broker groups records into per-partition batches
+# (like linger_ms/batch_size do) and compresses every batch, so no kafka is needed.
+# Run from the scripts folder: python bench_kafka.py
+import sys
+import gzip
+import time
+import zlib
+import random
+from datetime import datetime, timedelta
+
+sys.path.append('../backend')
+
+from kafka_codec import geohash, encode_message
+
+# -------------------- SETTINGS --------------------
+N_MESSAGES = 20000
+PARTITIONS = 3            # same as the 'test' topic in kafka.sh
+BATCH_SIZE = 64 * 1024    # KAFKA_BATCH_SIZE
+LABELS = ['Longitudinal Crack', 'Reflective & Transverse Crack', 'Alligator Crack', 'Potholes', 'Block Crack']
+# --------------------------------------------------
+
+def compressors():
+    codecs = {"none": lambda b: b, "gzip": lambda b: gzip.compress(b, 6)}
+    try:
+        import lz4.frame
+        codecs["lz4"] = lz4.frame.compress
+    except ImportError:
+        print("lz4 not installed, skipping")
+    try:
+        import zstandard
+        codecs["zstd"] = zstandard.ZstdCompressor(level=3).compress
+    except ImportError:
+        print("zstandard not installed, skipping")
+    return codecs
+
+def encodings():
+    names = ["json"]
+    try:
+        import msgpack
+        names.append("msgpack")
+    except ImportError:
+        print("msgpack not installed, skipping")
+    return names
+
+def synthetic_messages(n):
+    # detections around Alexandria, like the real stream
+    rng = random.Random(0)
+    start = datetime(2025, 9, 26, 10, 0, 0)
+    messages = []
+    for i in range(n):
+        lon = 29.97 + rng.random() * 0.05
+        lat = 31.24 + rng.random() * 0.05
+        time = (start + timedelta(seconds=i)).isoformat()
+        labels = [{
+            "label": rng.choice(LABELS),
+            "confidence": rng.random(),
+            "x1": rng.random() * 320, "y1": rng.random() * 320,
+            "x2": 320 + rng.random() * 320, "y2": 320 + rng.random() * 320,
+        } for _ in range(rng.randint(1, 4))]
+        messages.append({
+            "lon": lon, "lat": lat, "time": time, "labels": labels,
+            "ppm": 2500.0, "image": f"{lon}_{lat}_{time}.jpg"
+        })
+    return messages
+
+class BrokerStandIn:
+    """Collects records per partition and closes a batch when it reaches batch_size"""
+    def __init__(self, compress, partitions=PARTITIONS, batch_size=BATCH_SIZE):
+        self.compress = compress
+        self.batch_size = batch_size
+        self.open_batches = [[] for _ in range(partitions)]
+        self.open_sizes = [0] * partitions
+        self.wire_bytes = 0
+        self.batches = 0
+
+    def send(self, key, value):
+        # key hash -> partition, same key always on the same partition
+        partition = zlib.crc32(key.encode()) % len(self.open_batches)
+        self.open_batches[partition].append(value)
+        self.open_sizes[partition] += len(value)
+        if self.open_sizes[partition] >= self.batch_size:
+            self._flush(partition)
+
+    def _flush(self, partition):
+        if self.open_batches[partition]:
+            self.wire_bytes += len(self.compress(b"".join(self.open_batches[partition])))
+            self.batches += 1
+        self.open_batches[partition] = []
+        self.open_sizes[partition] = 0
+
+    def flush(self):
+        for partition in range(len(self.open_batches)):
+            self._flush(partition)
+
+messages = synthetic_messages(N_MESSAGES)
+keys = [geohash(m["lat"], m["lon"]) for m in messages]
+print(f"{N_MESSAGES} messages, {len(set(keys))} distinct geohash keys\n")
+
+print(f"{'encoding':>8} {'compression':>11} {'raw B/msg':>10} {'wire B/msg':>11} {'encode us/msg':>14} {'send us/msg':>12} {'batches':>8}")
+for encoding in encodings():
+    start = time.perf_counter()
+    values = [encode_message(m, encoding) for m in messages]
+    encode_us = (time.perf_counter() - start) / N_MESSAGES * 1e6
+    raw = sum(len(v) for v in values) / N_MESSAGES
+
+    for name, compress in compressors().items():
+        broker = BrokerStandIn(compress)
+        start = time.perf_counter()
+        for key, value in zip(keys, values):
+            broker.send(key, value)
+        broker.flush()
+        send_us = (time.perf_counter() - start) / N_MESSAGES * 1e6
+
+        print(f"{encoding:>8} {name:>11} {raw:>10.1f} {broker.wire_bytes / N_MESSAGES:>11.1f} {encode_us:>14.2f} {send_us:>12.2f} {broker.batches:>8}")
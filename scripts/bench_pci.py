@@ -0,0 +1,95 @@
+# Benchmark of the PCI computation in streamlit/db.py (Cassandra.calc_pci)
+# Compares the old row by row apply + groupby loop with the vectorized streamlit/pci.py
+# on synthetic cracks, and checks that both give exactly the same PCI and condition.
+# Run from the scripts folder: python bench_pci.py
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append('../streamlit')
+
+from pci import pci_table
+from deduct_value_func import get_deduct_value
+
+# -------------------- SETTINGS --------------------
+CRACK_COUNTS = [10_000, 100_000, 1_000_000]
+LEGACY_MAX = 100_000      # the old loop is too slow above this
+ROADS = 50_000
+LABELS = ['Longitudinal Crack', 'Reflective & Transverse Crack', 'Alligator Crack', 'Potholes', 'Block Crack']
+# --------------------------------------------------
+
+def pci_condition_label(pci):
+    if pci >= 85:
+        return "Excellent"
+    elif pci >= 70:
+        return "Good"
+    elif pci >= 55:
+        return "Fair"
+    elif pci >= 40:
+        return "Poor"
+    elif pci >= 25:
+        return "Very Poor"
+    else:
+        return "Failed"
+
+def legacy_pci(df):
+    """The old calc_pci (road_length already in meters)"""
+    df = df.copy()
+    df['crack_width'] = abs(df['x2'] - df['x1']) / df['ppm']
+    df['crack_length'] = abs(df['y2'] - df['y1']) / df['ppm']
+    df['crack_area'] = df['crack_width'] * df['crack_length']
+    df['road_area'] = df['road_length'] * 10
+    df['dd'] = (df['crack_area'] / df['road_area']) * 100
+    df['dv'] = df.apply(lambda row: get_deduct_value(row['label'], row['dd']), axis=1)
+    df = df.sort_values(by=['road_index', 'dv'], ascending=[True, False])
+
+    pci_list = []
+    for road_index, group in df.groupby('road_index'):
+        deduct_values = group['dv'].tolist()
+        if len(deduct_values) == 1:
+            pci = 100 - deduct_values[0]
+        else:
+            tdv = sum(deduct_values)
+            if tdv <= 100:
+                cdv = tdv - (tdv**2 / 250)
+            else:
+                cdv = 100 - 10 * np.sqrt(tdv - 100)
+            pci = max(0, 100 - cdv)
+        pci_list.append({'road_index': road_index, 'pci': round(pci, 2)})
+
+    pci_df = pd.DataFrame(pci_list)
+    pci_df['condition'] = pci_df['pci'].apply(pci_condition_label)
+    return pci_df
+
+def synthetic_cracks(n, rng):
+    road_index = rng.integers(0, ROADS, n)
+    road_length = rng.uniform(5, 2000, ROADS)
+    return pd.DataFrame({
+        'x1': rng.uniform(0, 640, n), 'x2': rng.uniform(0, 640, n),
+        'y1': rng.uniform(0, 640, n), 'y2': rng.uniform(0, 640, n),
+        'ppm': rng.choice([100.0, 2500.0], n),
+        'label': rng.choice(LABELS, n),
+        'road_index': road_index,
+        'road_length': road_length[road_index],
+    })
+
+rng = np.random.default_rng(0)
+print(f"{'cracks':>10} {'roads':>8} {'legacy s':>9} {'vectorized s':>13} {'speedup':>8} {'same':>5}")
+for n in CRACK_COUNTS:
+    df = synthetic_cracks(n, rng)
+
+    start = time.perf_counter()
+    new = pci_table(df)
+    new_s = time.perf_counter() - start
+
+    if n <= LEGACY_MAX:
+        start = time.perf_counter()
+        old = legacy_pci(df)
+        old_s = time.perf_counter() - start
+        same = old['road_index'].equals(new['road_index']) \
+            and np.array_equal(old['pci'].to_numpy(dtype=float), new['pci'].to_numpy(), equal_nan=True) \
+            and (old['condition'].to_numpy() == new['condition'].to_numpy()).all()
+        print(f"{n:>10} {len(new):>8} {old_s:>9.3f} {new_s:>13.3f} {old_s / new_s:>7.0f}x {str(same):>5}")
+    else:
+        print(f"{n:>10} {len(new):>8} {'-':>9} {new_s:>13.3f} {'-':>8} {'-':>5}")
@@ -0,0 +1,85 @@
+# Micro-benchmark of the per-frame post-processing in backend/model.py
+# Compares the old per-box loop with the columnar Detections at 1, 10 and 100 boxes
+# Run from the scripts folder: python bench_postprocess.py
+import sys
+import timeit
+import numpy as np
+
+sys.path.append('../backend')
+
+from detections import Detections
+
+# -------------------- SETTINGS --------------------
+BOX_COUNTS = [1, 10, 100]
+REPEATS = 2000
+NAMES = {i: f"class_{i}" for i in range(11)}
+# --------------------------------------------------
+
+# Use real tensors when torch is installed (device -> host copies included)
+try:
+    import torch
+    def tensor(a):
+        return torch.from_numpy(a)
+except ImportError:
+    class tensor(np.ndarray):
+        def __new__(cls, a):
+            return np.asarray(a).view(cls)
+        def cpu(self):
+            return self
+        def numpy(self):
+            return self.view(np.ndarray)
+
+class FakeBoxes:
+    """Mimics ultralytics Boxes: column tensors + iteration per box"""
+    def __init__(self, cls, conf, xyxy):
+        self.cls = tensor(cls)
+        self.conf = tensor(conf)
+        self.xyxy = tensor(xyxy)
+
+    def __len__(self):
+        return len(self.cls)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield FakeBoxes(self.cls.numpy()[i:i+1], self.conf.numpy()[i:i+1], self.xyxy.numpy()[i:i+1])
+
+class FakeResult:
+    def __init__(self, n):
+        rng = np.random.default_rng(0)
+        self.boxes = FakeBoxes(
+            rng.integers(0, len(NAMES), n).astype(np.float32),
+            rng.random(n, dtype=np.float32),
+            (rng.random((n, 4), dtype=np.float32) * 640)
+        )
+
+def per_box(result, names):
+    # the old loop of detect()
+    labels = []
+    for box in result.boxes:
+        cls_id = int(box.cls.cpu().numpy()[0])
+        conf = float(box.conf.cpu().numpy()[0])
+        xyxy = box.xyxy.cpu().numpy()[0]
+        labels.append({
+            "label": names[cls_id],
+            "confidence": float(conf),
+            "x1": float(xyxy[0]),
+            "y1": float(xyxy[1]),
+            "x2": float(xyxy[2]),
+            "y2": float(xyxy[3]),
+        })
+    return labels
+
+def columnar(result, names):
+    return Detections.from_result(result, names).to_list()
+
+print(f"{'boxes':>6} {'per-box (us)':>14} {'columnar (us)':>14} {'speedup':>8}")
+for n in BOX_COUNTS:
+    result = FakeResult(n)
+
+    # both must give the exact same JSON
+    assert per_box(result, NAMES) == columnar(result, NAMES)
+
+    old = min(timeit.repeat(lambda: per_box(result, NAMES), number=REPEATS, repeat=3)) / REPEATS * 1e6
+    new = min(timeit.repeat(lambda: columnar(result, NAMES), number=REPEATS, repeat=3)) / REPEATS * 1e6
+
+    print(f"{n:>6} {old:>14.1f} {new:>14.1f} {old / new:>7.1f}x")
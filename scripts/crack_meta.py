@@ -0,0 +1,87 @@
+# Filter options of the dashboard (districts, confidence range, date range) per district
+# in one small partition of crack_meta, so the sidebar reads a few rows with one query
+# instead of scanning the whole crack table three times.
+# spark.py widens the rows of the districts of every micro-batch (a district without a
+# row starts from all its cracks), migrate_crack_by_dist_day.py fills the districts of the
+# older cracks. Run this file to rebuild it from the crack table:
+#   spark-submit --packages com.datastax.spark:spark-cassandra-connector_2.12:3.5.0 crack_meta.py
+from functools import reduce
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+
+KEYSPACE = "pavementeye"
+BUCKET = "all"   # the only partition of crack_meta
+
+def crack_meta(cracks):
+    """crack rows -> crack_meta rows (one per district)"""
+    return cracks\
+        .filter(F.col("dist").isNotNull())\
+        .groupBy("dist")\
+        .agg(
+            F.min("confidence").alias("min_confidence"),
+            F.max("confidence").alias("max_confidence"),
+            F.min("timestamp").alias("min_timestamp"),
+            F.max("timestamp").alias("max_timestamp"),
+        )\
+        .withColumn("bucket", F.lit(BUCKET))
+
+def read_cracks(spark):
+    return spark.read\
+        .format("org.apache.spark.sql.cassandra")\
+        .options(table="crack", keyspace=KEYSPACE)\
+        .load()
+
+def read_meta(spark):
+    return spark.read\
+        .format("org.apache.spark.sql.cassandra")\
+        .options(table="crack_meta", keyspace=KEYSPACE)\
+        .load()\
+        .filter(F.col("bucket") == BUCKET)
+
+def write_meta(meta):
+    # written after the cracks of the batch: the dashboard cache drops the district's
+    # entries when updated_at moves (streamlit/query_cache.py)
+    meta.withColumn("updated_at", F.current_timestamp())\
+        .write\
+        .format("org.apache.spark.sql.cassandra")\
+        .options(table="crack_meta", keyspace=KEYSPACE)\
+        .mode("append")\
+        .save()
+
+def update_crack_meta(spark, batch_df):
+    """Widens the ranges of the districts that got new cracks"""
+    batch = crack_meta(batch_df)
+    dists = [row["dist"] for row in batch.select("dist").collect()]
+    if not dists:
+        return
+
+    # ranges only grow: merge the batch with the stored rows of the same districts
+    current = read_meta(spark).filter(F.col("dist").isin(dists)).select(*batch.columns)
+    parts = [batch, current]
+
+    # a district without a row may have older cracks (written before crack_meta existed),
+    # its row starts from all of them (dist is the partition key of crack: one partition each)
+    known = {row["dist"] for row in current.select("dist").collect()}
+    new = [d for d in dists if d not in known]
+    if new:
+        parts.append(crack_meta(read_cracks(spark).filter(F.col("dist").isin(new))))
+
+    merged = reduce(lambda a, b: a.unionByName(b), parts)\
+        .groupBy("bucket", "dist")\
+        .agg(
+            F.min("min_confidence").alias("min_confidence"),
+            F.max("max_confidence").alias("max_confidence"),
+            F.min("min_timestamp").alias("min_timestamp"),
+            F.max("max_timestamp").alias("max_timestamp"),
+        )
+    write_meta(merged)
+
+if __name__ == '__main__':
+    spark = SparkSession.builder \
+        .appName("PavementEye Crack Meta") \
+        .config("spark.cassandra.connection.host", "cassandra")\
+        .config("spark.cassandra.connection.port", "9042")\
+        .getOrCreate()
+
+    write_meta(crack_meta(read_cracks(spark)))
+    print("✅ crack_meta rebuilt")
@@ -0,0 +1,80 @@
+# Backfill of crack_by_dist_day from the existing crack table (see cassandra.cql)
+# New cracks are written to both tables by the spark job, this copies the older ones
+# and widens the dashboard filter options (crack_meta) with their districts and ranges.
+# Safe to run more than once (inserts are upserts on the same key).
+# Run from the scripts folder: python migrate_crack_by_dist_day.py [host] [port]
+import sys
+import time
+from datetime import datetime, timezone
+from cassandra.cluster import Cluster
+from cassandra.concurrent import execute_concurrent_with_args
+
+# -------------------- SETTINGS --------------------
+CASSANDRA_HOST = sys.argv[1] if len(sys.argv) > 1 else 'localhost'
+CASSANDRA_PORT = int(sys.argv[2]) if len(sys.argv) > 2 else 9042
+FETCH_SIZE = 5000    # rows per page read from crack
+CONCURRENCY = 64     # inserts in flight
+META_BUCKET = 'all'  # the only partition of crack_meta (see crack_meta.py)
+# --------------------------------------------------
+
+COLUMNS = ['dist', 'timestamp', 'id', 'road_index', 'label', 'confidence', 'image',
+           'lon', 'lat', 'x1', 'y1', 'x2', 'y2', 'ppm']
+
+cluster = Cluster([CASSANDRA_HOST], port=CASSANDRA_PORT)
+session = cluster.connect('pavementeye')
+
+insert = session.prepare(
+    f"INSERT INTO crack_by_dist_day (day, {', '.join(COLUMNS)}) VALUES (?, {', '.join('?' * len(COLUMNS))})"
+)
+
+select = session.prepare(f"SELECT {', '.join(COLUMNS)} FROM crack")
+select.fetch_size = FETCH_SIZE
+
+start = time.perf_counter()
+copied = 0
+failed = 0
+ranges = {}   # dist -> [min confidence, max confidence, min timestamp, max timestamp]
+
+# page by page, the whole table is never in memory
+rows = session.execute(select)
+while True:
+    page = rows.current_rows
+    params = [(row.timestamp.date(),) + tuple(row) for row in page if row.timestamp is not None]
+
+    for row in page:
+        if row.dist is None or row.timestamp is None or row.confidence is None:
+            continue
+        r = ranges.setdefault(row.dist, [row.confidence, row.confidence, row.timestamp, row.timestamp])
+        r[0], r[1] = min(r[0], row.confidence), max(r[1], row.confidence)
+        r[2], r[3] = min(r[2], row.timestamp), max(r[3], row.timestamp)
+
+    for success, result in execute_concurrent_with_args(session, insert, params, concurrency=CONCURRENCY, raise_on_first_error=False):
+        if success:
+            copied += 1
+        else:
+            failed += 1
+            print(f"❌ Insert failed: {result}")
+
+    print(f"{copied} cracks copied ({copied / (time.perf_counter() - start):.0f}/s)")
+
+    if not rows.has_more_pages:
+        break
+    rows.fetch_next_page()
+
+# crack_meta: ranges only grow, merged with the rows the spark job already wrote
+for row in session.execute("SELECT dist, min_confidence, max_confidence, min_timestamp, max_timestamp FROM crack_meta WHERE bucket = %s", (META_BUCKET,)):
+    if row.dist in ranges:
+        r = ranges[row.dist]
+        r[0], r[1] = min(r[0], row.min_confidence), max(r[1], row.max_confidence)
+        r[2], r[3] = min(r[2], row.min_timestamp), max(r[3], row.max_timestamp)
+
+insert_meta = session.prepare(
+    "INSERT INTO crack_meta (bucket, dist, min_confidence, max_confidence, min_timestamp, max_timestamp, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+# updated_at: the dashboard drops its cached queries of these districts
+now = datetime.now(timezone.utc)
+for dist, r in ranges.items():
+    session.execute(insert_meta, (META_BUCKET, dist, *r, now))
+
+cluster.shutdown()
+print(f"✅ Backfill done: {copied} copied, {failed} failed, {len(ranges)} districts in crack_meta in {time.perf_counter() - start:.1f}s")
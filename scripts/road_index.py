@@ -0,0 +1,105 @@
+# Road network as a compact indexed artifact shared by the spark job and the streamlit dashboard
+# Build it once (and again when geo.geojson changes) from the scripts folder:
+#   python road_index.py [path/to/geo.geojson] [path/to/roads_index.arrow]
+#
+# The artifact is an uncompressed Arrow IPC file, so loading it is a memory map
+# instead of parsing the GeoJSON. It holds:
+#   - road_index (same numbering as before: row position in geo.geojson)
+#   - every road attribute (name, fclass, maxspeed, oneway, bridge, tunnel, ADM2_EN, ...)
+#   - geometry as WKB (EPSG:4326)
+#   - bounding boxes (minx, miny, maxx, maxy) and length_m (EPSG:3857 length)
+# The STRtree itself cannot be serialized by shapely, it is bulk loaded from the
+# geometries on first use (packed, no insert cost).
+import os
+import sys
+import numpy as np
+import pyarrow as pa
+import shapely
+from shapely import STRtree
+
+ROADS_GEOJSON = '../data/egypt/geo.geojson'
+ROADS_INDEX = '../data/egypt/roads_index.arrow'
+
+def build_road_index(geojson_path=ROADS_GEOJSON, out_path=ROADS_INDEX):
+    """GeoJSON -> Arrow IPC artifact"""
+    import geopandas as gpd
+
+    roads_df = gpd.read_file(geojson_path).to_crs(epsg=4326)
+
+    attributes = roads_df.drop(columns='geometry')
+    attributes.insert(0, 'road_index', np.arange(len(roads_df), dtype=np.int32))
+    table = pa.Table.from_pandas(attributes, preserve_index=False)
+
+    bounds = roads_df.geometry.bounds
+    table = table.append_column('geometry', pa.array(roads_df.geometry.to_wkb().to_numpy(), type=pa.binary()))
+    for name in ['minx', 'miny', 'maxx', 'maxy']:
+        table = table.append_column(name, pa.array(bounds[name].to_numpy()))
+
+    # metric length used by the PCI (road area = length * width)
+    table = table.append_column('length_m', pa.array(roads_df.to_crs("EPSG:3857").geometry.length.to_numpy()))
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    tmp_path = out_path + '.part'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, out_path)
+
+    print(f"✅ Road index with {table.num_rows} roads saved to: {out_path}")
+    return out_path
+
+class RoadIndex:
+    """Memory mapped road artifact with lazy geometries and STRtree"""
+
+    def __init__(self, table):
+        self.table = table
+        self._geometries = None
+        self._tree = None
+
+    @classmethod
+    def load(cls, path=ROADS_INDEX):
+        # zero-copy: columns point into the mapped file
+        source = pa.memory_map(path, 'r')
+        return cls(pa.ipc.open_file(source).read_all())
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def column(self, name):
+        return self.table.column(name).to_numpy(zero_copy_only=False)
+
+    @property
+    def geometries(self):
+        if self._geometries is None:
+            self._geometries = shapely.from_wkb(self.column('geometry'))
+        return self._geometries
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            self._tree = STRtree(self.geometries)
+        return self._tree
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    def to_geodataframe(self, columns=None, geometry=True):
+        """Roads as a (Geo)DataFrame indexed like geo.geojson, with a road_index column"""
+        import geopandas as gpd
+
+        internal = ['geometry', 'minx', 'miny', 'maxx', 'maxy', 'length_m']
+        if columns is None:
+            columns = [c for c in self.table.column_names if c not in internal]
+        elif 'road_index' not in columns:
+            columns = ['road_index'] + list(columns)
+
+        df = self.table.select(columns).to_pandas()
+        df.index = df['road_index'].to_numpy()
+
+        if not geometry:
+            return df
+        return gpd.GeoDataFrame(df, geometry=self.geometries, crs="EPSG:4326")
+
+if __name__ == '__main__':
+    build_road_index(*sys.argv[1:3])
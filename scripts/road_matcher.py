@@ -0,0 +1,60 @@
+# Nearest road lookup used by the spark job (scripts/spark.py)
+# The STRtree is built once per executor python process and reused by every micro-batch
+import numpy as np
+import shapely
+from shapely import STRtree
+
+# Same limit as the old gpd.sjoin_nearest(..., max_distance=20) (in degrees, EPSG:4326)
+MAX_DISTANCE = 20
+
+class RoadMatcher:
+    """Nearest road (index and district) for whole arrays of points"""
+
+    def __init__(self, geometries, road_index, dists, max_distance=MAX_DISTANCE, tree=None, length_m=None):
+        self.tree = tree if tree is not None else STRtree(geometries)
+        self.road_index = np.asarray(road_index, dtype=np.int32)
+        self.dists = np.asarray(dists, dtype=object)
+        self.max_distance = max_distance
+        # metric road lengths (EPSG:3857) by road_index, used for the per road PCI
+        self.length_m = None if length_m is None else np.asarray(length_m, dtype=float)
+
+    @classmethod
+    def from_wkb(cls, wkb, road_index, dists, length_m=None, max_distance=MAX_DISTANCE):
+        return cls(shapely.from_wkb(wkb), road_index, dists, max_distance, length_m=length_m)
+
+    @classmethod
+    def from_road_index(cls, index, max_distance=MAX_DISTANCE):
+        # built from the memory mapped artifact of scripts/road_index.py
+        return cls(index.geometries, index.column('road_index'), index.column('ADM2_EN'), max_distance,
+                   tree=index.tree, length_m=index.column('length_m'))
+
+    def match(self, lon, lat):
+        """Returns (road_index, dist) arrays, -1 and "Unkown" when no road is found"""
+        points = shapely.points(np.asarray(lon, dtype=float), np.asarray(lat, dtype=float))
+
+        # one nearest road per point (pairs of point position, road position)
+        point_pos, road_pos = self.tree.query_nearest(points, max_distance=self.max_distance, all_matches=False)
+
+        road_index = np.full(len(points), -1, dtype=np.int32)
+        dists = np.full(len(points), "Unkown", dtype=object)
+        road_index[point_pos] = self.road_index[road_pos]
+        dists[point_pos] = self.dists[road_pos]
+
+        return road_index, dists
+
+# one matcher per executor process
+_matcher = None
+
+def get_matcher(roads_broadcast):
+    """Build the STRtree the first time a task runs on this executor"""
+    global _matcher
+    if _matcher is None:
+        roads = roads_broadcast.value
+        if 'index_file' in roads:
+            # road artifact shipped with addFile, memory mapped on the executor
+            from pyspark import SparkFiles
+            from road_index import RoadIndex
+            _matcher = RoadMatcher.from_road_index(RoadIndex.load(SparkFiles.get(roads['index_file'])))
+        else:
+            _matcher = RoadMatcher.from_wkb(**roads)
+    return _matcher
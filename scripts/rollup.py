@@ -0,0 +1,56 @@
+# Crack counts and areas per (dist, day, road_index, label, confidence percent)
+# The dashboard count charts read these small rows instead of every crack.
+# spark.py recomputes the (dist, day) partitions touched by every micro-batch,
+# run this file to (re)build all of them from crack_by_dist_day (e.g. after the backfill):
+#   spark-submit --packages com.datastax.spark:spark-cassandra-connector_2.12:3.5.0 rollup.py
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+
+KEYSPACE = "pavementeye"
+
+def crack_rollup(cracks):
+    """crack_by_dist_day rows -> crack_rollup rows"""
+    return cracks\
+        .withColumn("conf_pct", F.floor(F.col("confidence") * 100).cast("int"))\
+        .withColumn("area_m2", F.abs(F.col("x2") - F.col("x1")) * F.abs(F.col("y2") - F.col("y1")) / (F.col("ppm") * F.col("ppm")))\
+        .groupBy("dist", "day", "road_index", "label", "conf_pct")\
+        .agg(F.count("*").cast("int").alias("cracks"), F.sum("area_m2").alias("area_m2"))
+
+def read_cracks(spark):
+    return spark.read\
+        .format("org.apache.spark.sql.cassandra")\
+        .options(table="crack_by_dist_day", keyspace=KEYSPACE)\
+        .load()
+
+def write_rollup(rollup):
+    # whole rows are recomputed, so writing them again is an overwrite
+    rollup.write\
+        .format("org.apache.spark.sql.cassandra")\
+        .options(table="crack_rollup", keyspace=KEYSPACE)\
+        .mode("append")\
+        .save()
+
+def update_rollup(spark, batch_df):
+    """Recompute the rollup of the (dist, day) partitions that got new cracks"""
+    touched = batch_df.select("dist", "day").filter(F.col("dist").isNotNull()).distinct()
+    rows = touched.collect()
+    if not rows:
+        return
+
+    # IN on both partition key columns is pushed down by the connector, so only the
+    # partitions of these districts and days are read (not the whole table), then the
+    # join keeps the (dist, day) pairs that were actually touched
+    dists = sorted({row["dist"] for row in rows})
+    days = sorted({row["day"] for row in rows})
+    cracks = read_cracks(spark).filter(F.col("dist").isin(dists) & F.col("day").isin(days))
+    write_rollup(crack_rollup(cracks.join(F.broadcast(touched), ["dist", "day"])))
+
+if __name__ == '__main__':
+    spark = SparkSession.builder \
+        .appName("PavementEye Rollup") \
+        .config("spark.cassandra.connection.host", "cassandra")\
+        .config("spark.cassandra.connection.port", "9042")\
+        .getOrCreate()
+
+    write_rollup(crack_rollup(read_cracks(spark)))
+    print("✅ crack_rollup rebuilt")
@@ -4,6 +4,12 @@
 
 Write-Host "Starting PavementEye services..." -ForegroundColor Green
 
+# 0. build the road index artifact used by spark and streamlit (only once)
+if (-not (Test-Path "../data/egypt/roads_index.arrow")) {
+    Write-Host "Building road index..." -ForegroundColor Yellow
+    python road_index.py
+}
+
 
 # 1. running existing docker compose
 Write-Host "Starting containers..." -ForegroundColor Green
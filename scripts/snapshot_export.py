@@ -0,0 +1,140 @@
+# Exports the crack table to a Parquet snapshot for the dashboard snapshot mode
+# (DASHBOARD_SOURCE=snapshot, see streamlit/snapshot.py).
+# Files are partitioned by district and month: <out>/dist=<dist>/month=<YYYY-MM>/*.parquet
+# The new snapshot is written next to the old one and swapped in at the end,
+# so the dashboard never reads a half written snapshot.
+# Run from the scripts folder:
+#   python snapshot_export.py                          (from cassandra on localhost)
+#   python snapshot_export.py --host cassandra --every 600   (again every 10 minutes)
+#   python snapshot_export.py --csv ../data/*.csv      (offline, from crack exports)
+import os
+import time
+import shutil
+import argparse
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+# -------------------- SETTINGS --------------------
+SNAPSHOT_DIR = '../data/snapshot/crack'
+FETCH_SIZE = 5000    # rows per page read from crack
+# --------------------------------------------------
+
+# same columns (and order) as the crack table exports in data/
+SCHEMA = pa.schema([
+    ('dist', pa.string()),
+    ('timestamp', pa.timestamp('ms')),
+    ('id', pa.string()),
+    ('confidence', pa.float64()),
+    ('image', pa.string()),
+    ('label', pa.string()),
+    ('lat', pa.float64()),
+    ('lon', pa.float64()),
+    ('ppm', pa.float64()),
+    ('road_index', pa.int64()),
+    ('x1', pa.float64()),
+    ('x2', pa.float64()),
+    ('y1', pa.float64()),
+    ('y2', pa.float64()),
+])
+COLUMNS = SCHEMA.names
+
+# labels of the first model (case_study_2.csv) -> crack types of the deduct curves
+# (streamlit/deduct_value_func.py), so the PCI pages work on the older exports too
+OLD_LABELS = {
+    'Transverse Crack': 'Reflective & Transverse Crack',
+}
+
+PARTITIONING = ds.partitioning(pa.schema([('dist', pa.string()), ('month', pa.string())]), flavor='hive')
+
+def with_month(table):
+    """Adds the month partition column (YYYY-MM of the timestamp)"""
+    return table.append_column('month', pc.strftime(table['timestamp'], format='%Y-%m'))
+
+def read_cassandra(host, port):
+    """The crack table, page by page, as one Arrow table"""
+    from cassandra.cluster import Cluster
+
+    cluster = Cluster([host], port=port)
+    session = cluster.connect('pavementeye')
+
+    select = session.prepare(f"SELECT {', '.join(COLUMNS)} FROM crack")
+    select.fetch_size = FETCH_SIZE
+
+    batches = []
+    rows = session.execute(select)
+    while True:
+        page = rows.current_rows
+        if page:
+            columns = list(zip(*page))
+            columns[COLUMNS.index('id')] = [str(v) for v in columns[COLUMNS.index('id')]]
+            batches.append(pa.record_batch([pa.array(c, type=f.type) for c, f in zip(columns, SCHEMA)], schema=SCHEMA))
+            print(f"{sum(b.num_rows for b in batches)} cracks read")
+
+        if not rows.has_more_pages:
+            break
+        rows.fetch_next_page()
+
+    cluster.shutdown()
+    return pa.Table.from_batches(batches, schema=SCHEMA)
+
+def read_csv(paths):
+    """Crack exports (with or without the header line) as one Arrow table"""
+    tables = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            has_header = f.readline().strip().startswith('dist,')
+
+        df = pd.read_csv(path, header=0 if has_header else None, names=None if has_header else COLUMNS)
+        # cassandra timestamps are UTC, the snapshot keeps them naive like the driver does
+        df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601', utc=True).dt.tz_localize(None)
+        df['label'] = df['label'].replace(OLD_LABELS)
+        tables.append(pa.Table.from_pandas(df[COLUMNS], schema=SCHEMA, preserve_index=False))
+        print(f"{path}: {len(df)} cracks")
+
+    return pa.concat_tables(tables)
+
+def write_snapshot(table, out=SNAPSHOT_DIR):
+    """Writes the partitioned snapshot and swaps it with the previous one"""
+    table = with_month(table.filter(pc.is_valid(table['timestamp'])))
+
+    tmp = out.rstrip('/\\') + '.tmp'
+    old = out.rstrip('/\\') + '.old'
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    ds.write_dataset(
+        table, tmp,
+        format='parquet',
+        partitioning=PARTITIONING,
+        existing_data_behavior='error',
+        basename_template='part-{i}.parquet',
+    )
+
+    # swap: the snapshot is missing only between the two renames
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(out):
+        os.rename(out, old)
+    os.rename(tmp, out)
+    shutil.rmtree(old, ignore_errors=True)
+
+    return table.num_rows
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Parquet snapshot of the crack table")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=9042)
+    parser.add_argument('--csv', nargs='+', help="build the snapshot from crack exports instead of cassandra")
+    parser.add_argument('--out', default=SNAPSHOT_DIR)
+    parser.add_argument('--every', type=float, default=0, help="seconds between snapshots (0 = only once)")
+    args = parser.parse_args()
+
+    while True:
+        start = time.perf_counter()
+        table = read_csv(args.csv) if args.csv else read_cassandra(args.host, args.port)
+        rows = write_snapshot(table, args.out)
+        print(f"✅ Snapshot of {rows} cracks written to {args.out} in {time.perf_counter() - start:.1f}s")
+
+        if not args.every:
+            break
+        time.sleep(args.every)
@@ -3,16 +3,22 @@ from pyspark.sql.functions import *
 from pyspark.sql.types import *
 from pyspark.sql import functions as F
 import geopandas as gpd
+import pandas as pd
+import os
 
 spark = SparkSession.builder \
     .appName("PavementEye Stream") \
     .config("spark.cassandra.connection.host", "cassandra")\
     .config("spark.cassandra.connection.port", "9042")\
+    .config("spark.sql.session.timeZone", "UTC")\
     .getOrCreate()
 
 # kafka parameters
 kafka_bootstrap_servers = 'kafka:9092'  # kafka:9092 as we are inside the docker network
 kafka_topic = 'test' # Can be changed later
+# json (default) or msgpack, must match KAFKA_ENCODING of the backend
+# msgpack needs `pip install msgpack` in the spark container
+kafka_encoding = os.getenv('KAFKA_ENCODING', 'json')
 
 
 # read data from Kafka
@@ -24,7 +30,21 @@ kafka_stream_df = spark.readStream \
 
 
 # To be able to see the right parsed value of the message
-parse_kafka_stream = kafka_stream_df.selectExpr('CAST(value as STRING) as json_value')
+if kafka_encoding == 'msgpack':
+    def decode_value(value):
+        # Import inside the UDF for execution on workers
+        import json
+        import msgpack
+
+        # messages from older producers are still JSON
+        if value[:1] == b'{':
+            return value.decode('utf-8')
+        return json.dumps(msgpack.unpackb(value, raw=False))
+
+    decode_value = udf(decode_value, StringType())
+    parse_kafka_stream = kafka_stream_df.select(decode_value(col('value')).alias('json_value'))
+else:
+    parse_kafka_stream = kafka_stream_df.selectExpr('CAST(value as STRING) as json_value')
 
 # Define schema for the incoming JSON messages
 schema = StructType([
@@ -92,71 +112,148 @@ df_valid_coords = cleaned_df.filter(
 # inster the id (identifier for the crack)
 df_valid_coords = df_valid_coords.withColumn("id", expr("uuid()"))
 
-# load roads dataset
-roads_df = gpd.read_file('../data/egypt/geo.geojson').to_crs(epsg=4326)
-roads_df = roads_df.drop(['index'], axis=1)
-roads_broadcast = spark.sparkContext.broadcast(roads_df)
-
-def join_roads(lon, lat):
-    # Import necessary libraries inside the UDF for execution on workers
-    import geopandas as gpd
-    from shapely.geometry import Point
-    
-    # Access the broadcasted roads data
-    roads_df_local = roads_broadcast.value
-
-    location = Point(lon, lat)
-    stream_geo_df = gpd.GeoDataFrame(geometry=[location], crs="EPSG:4326")
-
-    # Perform the nearest-neighbor spatial join
-    joined_data = gpd.sjoin_nearest(stream_geo_df, roads_df_local, how='inner', max_distance=20)
+# ship the road modules to the executors
+scripts_dir = os.path.dirname(os.path.abspath(__file__))
+spark.sparkContext.addPyFile(os.path.join(scripts_dir, 'road_matcher.py'))
+spark.sparkContext.addPyFile(os.path.join(scripts_dir, 'road_index.py'))
 
-    if not joined_data.empty:
-        # Return the index of the nearest road (scalar)
-        return int(joined_data.iloc[0]['index_right'])
-    else:
-        # Return a default value when no match is found
-        return -1
+from road_index import ROADS_INDEX
+from rollup import update_rollup
+from crack_meta import update_crack_meta
 
-join_roads = udf(join_roads, IntegerType())
-
-
-def get_dist(lon, lat):
-    # Import necessary libraries inside the UDF for execution on workers
-    import geopandas as gpd
-    from shapely.geometry import Point
-    
-    # Access the broadcasted roads data
-    roads_df_local = roads_broadcast.value
+# load roads dataset
+if os.path.exists(ROADS_INDEX):
+    # prebuilt artifact (python road_index.py), memory mapped by every executor
+    spark.sparkContext.addFile(ROADS_INDEX)
+    roads_broadcast = spark.sparkContext.broadcast({'index_file': os.path.basename(ROADS_INDEX)})
+else:
+    roads_df = gpd.read_file('../data/egypt/geo.geojson').to_crs(epsg=4326)
+    roads_df = roads_df.drop(['index'], axis=1)
 
-    location = Point(lon, lat)
-    stream_geo_df = gpd.GeoDataFrame(geometry=[location], crs="EPSG:4326")
+    # Only what the nearest road search needs (WKB is much lighter to ship than the GeoDataFrame)
+    roads_broadcast = spark.sparkContext.broadcast({
+        'wkb': roads_df.geometry.to_wkb().tolist(),
+        'road_index': roads_df.index.tolist(),
+        'dists': roads_df['ADM2_EN'].tolist(),
+        'length_m': roads_df.to_crs("EPSG:3857").geometry.length.tolist()
+    })
 
-    # Perform the nearest-neighbor spatial join
-    joined_data = gpd.sjoin_nearest(stream_geo_df, roads_df_local, how='inner', max_distance=20)
+@pandas_udf("road_index int, dist string")
+def match_roads(lon: pd.Series, lat: pd.Series) -> pd.DataFrame:
+    # Import inside the UDF for execution on workers
+    from road_matcher import get_matcher
 
-    if not joined_data.empty:
-        # Return the index of the nearest road (scalar)
-        return joined_data.iloc[0]['ADM2_EN']
-    else:
-        # Return a default value when no match is found
-        return "Unkown"
+    # STRtree built once per executor, then one nearest search for the whole micro-batch
+    road_index, dist = get_matcher(roads_broadcast).match(lon.to_numpy(), lat.to_numpy())
 
-get_dist = udf(get_dist, StringType())
+    return pd.DataFrame({'road_index': road_index, 'dist': dist})
 
 
 df_with_roads = df_valid_coords\
-    .withColumn("road_index", join_roads(col("lon"), col("lat")))\
-    .withColumn("dist", get_dist(col("lon"), col("lat")))
+    .withColumn("road", match_roads(col("lon"), col("lat")))\
+    .withColumn("road_index", col("road.road_index"))\
+    .withColumn("dist", col("road.dist"))\
+    .drop("road")
 
 # To insert the stream into cassandra database
-df_with_roads.writeStream\
+# crack is the main table, crack_by_dist_day the same rows partitioned by (dist, day)
+# for the dashboard filters (no ALLOW FILTERING scans)
+# day is the UTC date of the timestamp (session time zone pinned above), like the
+# dashboard and migrate_crack_by_dist_day.py, so cracks near midnight are not missed
+def write_cracks(batch_df, batch_id):
+    batch_df.persist()
+    for table, df in [("crack", batch_df.drop("day")), ("crack_by_dist_day", batch_df)]:
+        df.write\
+            .format("org.apache.spark.sql.cassandra")\
+            .options(table=table, keyspace="pavementeye")\
+            .mode("append")\
+            .save()
+
+    # counts per (dist, day, road, label) for the dashboard charts (see rollup.py)
+    update_rollup(spark, batch_df)
+    # districts, confidence and date ranges for the dashboard filters (see crack_meta.py)
+    update_crack_meta(spark, batch_df)
+    batch_df.unpersist()
+
+df_with_roads\
+    .withColumn("day", to_date(col("timestamp")))\
+    .writeStream\
     .outputMode("append")\
-    .format("org.apache.spark.sql.cassandra")\
-    .options(table="crack", keyspace="pavementeye")\
+    .foreachBatch(write_cracks)\
     .option('checkpointLocation', '/tmp/checkpoint40')\
-    .start()\
-    .awaitTermination()
+    .start()
+
+
+# Per road PCI ----------------------------------------------------------------------------
+# Running totals per road (cracks, total deduct value, largest DV and q) updated as
+# cracks arrive, so the dashboard reads the PCI from the road_pci table instead of
+# recomputing it. The state has a fixed size however many cracks a road gets.
+# Same formulas as the dashboard (streamlit/pci.py and deduct_value_func.py)
+streamlit_dir = os.path.join(scripts_dir, '..', 'streamlit')
+spark.sparkContext.addPyFile(os.path.join(streamlit_dir, 'deduct_value_func.py'))
+spark.sparkContext.addPyFile(os.path.join(streamlit_dir, 'pci.py'))
+
+road_pci_schema = "dist string, road_index int, dv_max double, tdv double, q int, " \
+    "pci double, condition string, cracks int, updated_at timestamp"
+road_pci_state_schema = "cracks long, tdv double, dv_max double, q long"
+
+def update_road_pci(key, batches, state):
+    # Import inside the function for execution on workers
+    import numpy as np
+    from pci import crack_density, pci_from_totals, condition_labels
+    from deduct_value_func import deduct_values
+    from road_matcher import get_matcher
+
+    dist, road_index = key
+    road_length = get_matcher(roads_broadcast).length_m[road_index]
+
+    cracks, tdv, dv_max, q = state.get if state.exists else (0, 0.0, 0.0, 0)
+    for pdf in batches:
+        dd = crack_density(
+            pdf['x1'].to_numpy(), pdf['x2'].to_numpy(), pdf['y1'].to_numpy(), pdf['y2'].to_numpy(),
+            pdf['ppm'].to_numpy(), np.full(len(pdf), road_length)
+        )
+        # a label without a deduct curve must not stop the stream, it deducts nothing
+        dv = deduct_values(pdf['label'].to_numpy(), dd, unknown='zero')
+        cracks += len(dv)
+        tdv += float(dv.sum())
+        dv_max = float(np.max(dv, initial=dv_max)) # not pyspark's max (import *)
+        q += int((dv > 2).sum())
+    state.update((cracks, tdv, dv_max, q))
+
+    pci = pci_from_totals(np.array([cracks]), np.array([tdv]), np.array([dv_max]))
+    yield pd.DataFrame({
+        'dist': [dist],
+        'road_index': [road_index],
+        'dv_max': [dv_max],
+        'tdv': [tdv],
+        'q': [q],
+        'pci': [float(pci[0])],
+        'condition': [condition_labels(pci)[0]],
+        'cracks': [cracks],
+        'updated_at': [pd.Timestamp.now(tz='UTC')],
+    })
+
+def write_road_pci(batch_df, batch_id):
+    # upsert: one row per road
+    batch_df.write\
+        .format("org.apache.spark.sql.cassandra")\
+        .options(table="road_pci", keyspace="pavementeye")\
+        .mode("append")\
+        .save()
+
+df_with_roads\
+    .filter(col("road_index") != -1)\
+    .select("dist", "road_index", "label", "x1", "x2", "y1", "y2", "ppm")\
+    .groupBy("dist", "road_index")\
+    .applyInPandasWithState(update_road_pci, road_pci_schema, road_pci_state_schema, "update", "NoTimeout")\
+    .writeStream\
+    .outputMode("update")\
+    .foreachBatch(write_road_pci)\
+    .option('checkpointLocation', '/tmp/checkpoint_road_pci_totals')\
+    .start()
+
+spark.streams.awaitAnyTermination()
 
 
 # This is for testing (printing in the notebook)
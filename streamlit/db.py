@@ -1,14 +1,92 @@
 # This class to init connection with 
 # the running cassandra container
 
-from cassandra.cluster import Cluster
+from datetime import datetime, time, timezone
+import os
 import geopandas as gpd
 import pandas as pd
-from deduct_value_func import get_deduct_value
+from pci import pci_table
 import numpy as np
+from roads import get_roads
+from query_cache import query_cache, cache_key
+
+# Where the dashboard reads the cracks: cassandra (live), snapshot (parquet files, see snapshot.py)
+# or duckdb (SQL over the parquet files, see duck.py)
+DASHBOARD_SOURCE = os.getenv("DASHBOARD_SOURCE", "cassandra")
+
+# rows per page fetched from cassandra
+FETCH_SIZE = 5000
+
+# max queries in flight when reading many partitions
+CONCURRENCY = 32
+
+# the only partition of crack_meta (filter options, see scripts/crack_meta.py)
+META_BUCKET = "all"
+
+def pandas_factory(colnames, rows):
+  # every page becomes a DataFrame at once (no dict per row)
+  return pd.DataFrame(rows, columns=colnames)
+
+# Copy on write: frames derived from another (projections, shallow copies) share its
+# memory until one of them is changed (always on from pandas 3)
+if int(pd.__version__.split('.')[0]) < 3:
+  pd.options.mode.copy_on_write = True
+
+def join_roads(data, columns=None, geometry=True):
+  """
+  Cracks with the attributes and geometry of their road (a new GeoDataFrame).
+  columns: only these road attributes (all by default), geometry=False: no geometry
+  (a plain DataFrame, the geometries are not copied).
+  """
+  # loaded once per process (see roads.py), the merge makes a new frame
+  roads = get_roads()
+  if columns is not None or not geometry:
+    names = roads.columns if columns is None else columns
+    names = [c for c in names if c in roads.columns and c not in ('road_index', 'geometry')]
+    roads = roads[['road_index'] + names + (['geometry'] if geometry else [])]
+
+  return roads\
+    .merge(data, how='right', left_on='road_index', right_on='road_index')
+
+def road_lengths(road_index):
+  """Metric length of the roads (a Series indexed by road_index, nan for unknown roads)"""
+  road_index = pd.unique(np.asarray(road_index))
+  roads = get_roads().reindex(road_index)
+
+  # Project to metric CRS to get accurate lengths (once per road, not once per crack)
+  return pd.Series(roads.geometry.to_crs("EPSG:3857").length.to_numpy(), index=road_index)
+
+def road_pci_table(data):
+  """pci, condition and number of cracks (one row per road) of cracks with x1, x2, y1, y2, ppm, label, road_index"""
+  df = data[data['road_index'] != -1]
+
+  cracks = df[['x1', 'x2', 'y1', 'y2', 'ppm', 'label', 'road_index']].assign(
+    road_length=road_lengths(df['road_index']).reindex(df['road_index'].to_numpy()).to_numpy()
+  )
+
+  # Vectorized PCI per road (see pci.py)
+  pci_df = pci_table(cracks)
+  counts = df.groupby('road_index').size()
+  return pci_df.assign(cracks=counts.reindex(pci_df['road_index'].to_numpy()).to_numpy())
+
+def calc_pci(data):
+  """Joined cracks (see join_roads) with the pci and condition of their road"""
+  pci_df = road_pci_table(data).drop(columns='cracks')
+
+  return data.merge(pci_df, how='left', left_on='road_index', right_on='road_index')
+
+def calc_road_pci(data):
+  """
+  One row per road (road attributes, geometry, pci, condition, cracks) from the cracks,
+  so the road geometries are not repeated for every crack (used by the maps)
+  """
+  return join_roads(road_pci_table(data))
 
 class Cassandra:
   def __init__(self, CASSANDRA_HOST='localhost', CASSANDRA_PORT=9042):
+    # imported here: the snapshot and duckdb sources use this module without cassandra-driver
+    from cassandra.cluster import Cluster
+
     try:
       print(f"Connecting to cassandra on host = {CASSANDRA_HOST}, port = {CASSANDRA_PORT} ...")
 
@@ -21,100 +99,225 @@ class Cassandra:
       # use our keyspace database
       self.session.set_keyspace('pavementeye')
 
-      self.data = None
-      
+      # results come as one DataFrame per page
+      self.session.row_factory = pandas_factory
+      self.session.default_fetch_size = FETCH_SIZE
+
+      # prepared statements by query text
+      self.prepared = {}
+
       print("Cassnadra connected successfully !")
     except:
       return "Error in cassandra connection"
 
-  def exec(self, query):
+  def prepare(self, query, fetch_size=FETCH_SIZE):
+    """Prepared statement of the query (prepared once, then reused)"""
+    if query not in self.prepared:
+      statement = self.session.prepare(query)
+      statement.fetch_size = fetch_size
+      self.prepared[query] = statement
+    return self.prepared[query]
+
+  @staticmethod
+  def to_frame(result):
+    """All the pages of a result as one DataFrame"""
+    pages = []
+    while True:
+      pages.append(result._current_rows)
+      if not result.has_more_pages:
+        break
+      result.fetch_next_page()
+
+    pages = [p for p in pages if isinstance(p, pd.DataFrame)]
+    if not pages:
+      return pd.DataFrame()
+    return pages[0] if len(pages) == 1 else pd.concat(pages, ignore_index=True)
+
+  def exec(self, query, params=None):
+    """
+    Runs a query and returns the rows as a DataFrame.
+
+    With params the query is prepared (use ? placeholders), so values never
+    have to be formatted into the query text.
+    """
     try:
-      rows = self.session.execute(query)
-
-      # parse data to be as normal python lists and dic
-      data = []
-      for row in rows:
-        row_dict = dict(row._asdict())
-        data.append(row_dict)
+      if params is None:
+        result = self.session.execute(query)
+      else:
+        result = self.session.execute(self.prepare(query), params)
 
-      self.data = pd.DataFrame(data)
-
-      return self.data
+      return self.to_frame(result)
     except:
       return "Error in the cassandra query"
-    
-  def join_roads(self):
-    roads_df = gpd.read_file('../data/egypt/geo.geojson').to_crs(epsg=4326)
-
-    roads_df['road_index'] = roads_df.index
-    joined = roads_df\
-      .merge(self.data, how='right', left_on='road_index', right_on='road_index')
-
-    self.data = joined
-
-    return self.data
-  
-  def calc_pci(self):
-    df = self.data[self.data['road_index'] != -1].copy()
-
-    # Calculate crack dimensions in meters (change 200 to actual ppm if needed)
-    df['crack_width'] = abs(df['x2'] - df['x1']) / df['ppm']
-    df['crack_length'] = abs(df['y2'] - df['y1']) / df['ppm']
-
-    # Crack area in m²
-    df['crack_area'] = df['crack_width'] * df['crack_length']
-
-    # Project to metric CRS to get accurate lengths
-    df = df.to_crs("EPSG:3857")
-    df['road_length'] = df.geometry.length
-
-    # Assume road width = 10m
-    df['road_area'] = df['road_length'] * 10
-
-    # Distress density (% of road area)
-    df['dd'] = (df['crack_area'] / df['road_area']) * 100
-
-    # Deduct value (medium severity)
-    df['dv'] = df.apply(lambda row: get_deduct_value(row['label'], row['dd']), axis=1)
 
-    # Sort by road_index and DV (descending)
-    df = df.sort_values(by=['road_index', 'dv'], ascending=[True, False])
-
-    # Group by road and calculate PCI
-    pci_list = []
-    for road_index, group in df.groupby('road_index'):
-        deduct_values = group['dv'].tolist()
-        q = sum(1 for dv in deduct_values if dv > 2)
-
-        if not deduct_values:
-            pci = 100.0
-        elif len(deduct_values) == 1:
-            pci = 100 - deduct_values[0]
-        else:
-            # Total Deduct Value
-            tdv = sum(deduct_values)
-
-            # Simple CDV correction approximation (more precise formula can be added)
-            if tdv <= 100:
-                cdv = tdv - (tdv**2 / 250)
-            else:
-                cdv = 100 - 10 * np.sqrt(tdv - 100)
-
-            pci = max(0, 100 - cdv)
-
-        pci_list.append({'road_index': road_index, 'pci': round(pci, 2)})
-
-    # Convert to DataFrame for export/plot
-    pci_df = pd.DataFrame(pci_list)
+  def exec_async(self, query, params_list, concurrency=CONCURRENCY):
+    """
+    Runs a prepared query once per params (e.g. one per partition) with up to
+    `concurrency` queries in flight, returns all the rows as one DataFrame.
+    """
+    try:
+      statement = self.prepare(query)
+      params_list = list(params_list)
 
-    pci_df['condition'] = pci_df['pci'].apply(self.pci_condition_label)
+      frames = []
+      for i in range(0, len(params_list), concurrency):
+        futures = [self.session.execute_async(statement, params) for params in params_list[i:i + concurrency]]
+        frames.extend(self.to_frame(future.result()) for future in futures)
 
+      frames = [f for f in frames if not f.empty]
+      return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    except:
+      return "Error in the cassandra query"
     
-    self.data = self.data\
-      .merge(pci_df,how='left', left_on='road_index', right_on='road_index')
+  def exec_filtered(self, columns, filters):
+    """
+    Cracks matching the dashboard filters (districts, confidence, start_date, end_date).
+
+    All the columns are fetched once per filter set and shared by every page and
+    session (see query_cache.py), each call gets only its columns ("*" for all).
+    """
+    query_cache.refresh(self, filters['districts'])
+
+    key = cache_key(filters)
+    data = query_cache.get(key)
+    if data is None:
+      data = self.fetch_filtered(filters)
+      if not isinstance(data, pd.DataFrame):
+        return data
+      query_cache.put(key, data)
+
+    # the cached frame is shared: callers get a new frame (copy on write, no data copied)
+    if columns.strip() == '*' or data.empty:
+      return data.copy(deep=False)
+    return data[[c.strip() for c in columns.split(',')]]
+
+  def fetch_filtered(self, filters):
+    """
+    Reads crack_by_dist_day one (dist, day) partition at a time (concurrently)
+    instead of scanning the crack table with ALLOW FILTERING.
+    """
+    # days and timestamps are UTC, like the day spark writes (to_date in a UTC session)
+    days = pd.date_range(filters['start_date'], filters['end_date'], freq='D').date
+    start = datetime.combine(filters['start_date'], time(0, 0, 0), tzinfo=timezone.utc)
+    end = datetime.combine(filters['end_date'], time(23, 59, 59), tzinfo=timezone.utc)
+
+    data = self.exec_async(
+      "SELECT * FROM crack_by_dist_day WHERE dist = ? AND day = ? AND timestamp >= ? AND timestamp <= ?",
+      [(dist, day, start, end) for dist in filters['districts'] for day in days]
+    )
+    if not isinstance(data, pd.DataFrame):
+      return data
+
+    # confidence is not part of the key, it is filtered here, then newest first like the
+    # crack table (the partitions come oldest day first, district by district)
+    if not data.empty:
+      data = data[data['confidence'] >= filters['confidence']]\
+        .sort_values('timestamp', ascending=False, ignore_index=True)
+
+    return data
+
+  def exec_rollup(self, filters):
+    """
+    Crack counts (cracks) and areas (area_m2) per road_index and label for the
+    dashboard filters, from crack_rollup instead of the cracks themselves.
+    The confidence threshold is applied per percent (floor(confidence * 100)).
+    """
+    query_cache.refresh(self, filters['districts'])
+
+    key = cache_key(filters) + ('rollup',)
+    data = query_cache.get(key)
+    if data is not None:
+      return data.copy(deep=False)
+
+    days = pd.date_range(filters['start_date'], filters['end_date'], freq='D').date
+    data = self.exec_async(
+      "SELECT road_index, label, conf_pct, cracks, area_m2 FROM crack_rollup WHERE dist = ? AND day = ?",
+      [(dist, day) for dist in filters['districts'] for day in days]
+    )
+    if not isinstance(data, pd.DataFrame):
+      return data
+
+    if not data.empty:
+      data = data[data['conf_pct'] >= int(np.floor(round(filters['confidence'] * 100, 6)))]\
+        .groupby(['road_index', 'label'], as_index=False)[['cracks', 'area_m2']].sum()
+
+    query_cache.put(key, data)
+    return data.copy(deep=False)
+
+  def exec_pci(self, columns, filters):
+    """Cracks matching the dashboard filters with the pci and condition of their road"""
+    return calc_pci(join_roads(self.exec_filtered(columns, filters)))
+
+  def exec_road_pci(self, filters):
+    """One row per road with the pci, condition and number of the cracks matching the dashboard filters"""
+    return calc_road_pci(self.exec_filtered("x1,x2,y1,y2, road_index, label, ppm", filters))
+
+  def newest_update(self, dist):
+    """Last time the spark job wrote cracks of the district (None if never)"""
+    # crack_meta.updated_at is written after crack_by_dist_day (see scripts/spark.py),
+    # for every crack, on a road or not
+    try:
+      result = self.session.execute(
+        self.prepare("SELECT updated_at FROM crack_meta WHERE bucket = ? AND dist = ?"), (META_BUCKET, dist)
+      )
+      data = self.to_frame(result)
+    except:
+      return None
+    if data.empty:
+      return None
+    newest = data.iloc[0, 0]
+    return None if pd.isna(newest) else newest
+
+  def road_pci(self, dists):
+    """Precomputed PCI of every road in the districts (kept up to date by the spark job)"""
+    # one single partition query per district
+    data = self.exec_async(
+      "SELECT road_index, pci, condition, cracks FROM road_pci WHERE dist = ?",
+      [(dist,) for dist in dists]
+    )
+    if not isinstance(data, pd.DataFrame) or data.empty:
+      return pd.DataFrame()
+
+    return join_roads(data)
+
+  def exec_all(self, columns):
+    """Columns of every crack (no filters)"""
+    return self.exec(f"SELECT {columns} FROM crack")
+
+  def filter_options(self):
+    """Districts, confidence range and date range of all the cracks"""
+    # one partition kept up to date by the spark job (see scripts/crack_meta.py)
+    meta = self.exec(
+      "SELECT dist, min_confidence, max_confidence, min_timestamp, max_timestamp FROM crack_meta WHERE bucket = ?",
+      (META_BUCKET,)
+    )
+    if isinstance(meta, pd.DataFrame) and not meta.empty:
+      return {
+        'districts': meta['dist'].tolist(),
+        'min_confidence': float(meta['min_confidence'].min()),
+        'max_confidence': float(meta['max_confidence'].max()),
+        'min_date': pd.to_datetime(meta['min_timestamp'].min()).date(),
+        'max_date': pd.to_datetime(meta['max_timestamp'].max()).date()
+      }
+
+    # crack_meta is empty until the spark job (or crack_meta.py) has filled it, scan crack then
+    # Get distinct districts
+    dists = self.exec("SELECT DISTINCT dist FROM crack")
+
+    # Get confidence range
+    conf_result = self.exec("SELECT max(confidence) as max_conf, min(confidence) as min_conf FROM crack")
+
+    # Get date range
+    date_result = self.exec("SELECT max(timestamp) as max_ts, min(timestamp) as min_ts FROM crack")
+
+    return {
+      'districts': dists.iloc[:, 0].unique().tolist() if not dists.empty else [],
+      'min_confidence': float(conf_result.iloc[0, 1]),
+      'max_confidence': float(conf_result.iloc[0, 0]),
+      'min_date': pd.to_datetime(date_result.iloc[0, 1]).date(),
+      'max_date': pd.to_datetime(date_result.iloc[0, 0]).date()
+    }
 
-    return self.data
-  
   def pci_condition_label(self, pci):
     if pci >= 85:
         return "Excellent"
@@ -129,7 +332,15 @@ class Cassandra:
     else:
         return "Failed"
 
-
-
-
-
+def connect(source=DASHBOARD_SOURCE):
+  """The crack data source of the dashboard pages (same methods for both)"""
+  if source == "cassandra":
+    return Cassandra()
+  elif source == "snapshot":
+    from snapshot import Snapshot
+    return Snapshot()
+  elif source == "duckdb":
+    from duck import DuckDB
+    return DuckDB()
+  else:
+    raise ValueError(f"Unsupported dashboard source: {source}. Available sources: ['cassandra', 'snapshot', 'duckdb']")
@@ -1,4 +1,123 @@
 import numpy as np
+import pandas as pd
+
+# Define logistic curve parameters for each crack type and severity
+CRACK_CURVES = {
+    'Rutting': {
+        'Low':    {'Dmax': 40, 'k': 0.15, 'x0': 35},
+        'Medium': {'Dmax': 60, 'k': 0.20, 'x0': 30},
+        'High':   {'Dmax': 80, 'k': 0.25, 'x0': 25}
+    },
+    'Reflective & Transverse Crack': {
+        'Low':    {'Dmax': 35, 'k': 0.14, 'x0': 40},
+        'Medium': {'Dmax': 55, 'k': 0.18, 'x0': 35},
+        'High':   {'Dmax': 75, 'k': 0.22, 'x0': 30}
+    },
+    'Block Crack': {
+        'Low':    {'Dmax': 45, 'k': 0.16, 'x0': 30},
+        'Medium': {'Dmax': 65, 'k': 0.20, 'x0': 25},
+        'High':   {'Dmax': 85, 'k': 0.24, 'x0': 20}
+    },
+    'Longitudinal Crack': {
+        'Low':    {'Dmax': 35, 'k': 0.15, 'x0': 35},
+        'Medium': {'Dmax': 55, 'k': 0.18, 'x0': 30},
+        'High':   {'Dmax': 75, 'k': 0.22, 'x0': 25}
+    },
+    'Alligator Crack': {
+        'Low':    {'Dmax': 45, 'k': 0.15, 'x0': 30},
+        'Medium': {'Dmax': 65, 'k': 0.20, 'x0': 25},
+        'High':   {'Dmax': 85, 'k': 0.25, 'x0': 20}
+    },
+    'Patching': {
+        'Low':    {'Dmax': 30, 'k': 0.12, 'x0': 40},
+        'Medium': {'Dmax': 50, 'k': 0.16, 'x0': 35},
+        'High':   {'Dmax': 70, 'k': 0.20, 'x0': 30}
+    },
+    'Potholes': {
+        'Low':    {'Dmax': 50, 'k': 0.20, 'x0': 25},
+        'Medium': {'Dmax': 70, 'k': 0.25, 'x0': 20},
+        'High':   {'Dmax': 90, 'k': 0.30, 'x0': 15}
+    },
+    'Bleeding': {
+        'Low':    {'Dmax': 25, 'k': 0.10, 'x0': 45},
+        'Medium': {'Dmax': 45, 'k': 0.14, 'x0': 40},
+        'High':   {'Dmax': 65, 'k': 0.18, 'x0': 35}
+    },
+    'Corrugation': {
+        'Low':    {'Dmax': 35, 'k': 0.13, 'x0': 40},
+        'Medium': {'Dmax': 55, 'k': 0.17, 'x0': 35},
+        'High':   {'Dmax': 75, 'k': 0.21, 'x0': 30}
+    },
+    'Raveling & Weathering': {
+        'Low':    {'Dmax': 30, 'k': 0.11, 'x0': 45},
+        'Medium': {'Dmax': 50, 'k': 0.15, 'x0': 40},
+        'High':   {'Dmax': 70, 'k': 0.19, 'x0': 35}
+    },
+    'Bumps & Sags': {
+        'Low':    {'Dmax': 40, 'k': 0.14, 'x0': 35},
+        'Medium': {'Dmax': 60, 'k': 0.18, 'x0': 30},
+        'High':   {'Dmax': 80, 'k': 0.22, 'x0': 25}
+    },
+}
+
+SEVERITIES = ['Low', 'Medium', 'High']
+CRACK_TYPES = list(CRACK_CURVES.keys())
+
+# Same parameters as arrays indexed by [crack type, severity]
+DMAX = np.array([[CRACK_CURVES[t][s]['Dmax'] for s in SEVERITIES] for t in CRACK_TYPES], dtype=float)
+K = np.array([[CRACK_CURVES[t][s]['k'] for s in SEVERITIES] for t in CRACK_TYPES], dtype=float)
+X0 = np.array([[CRACK_CURVES[t][s]['x0'] for s in SEVERITIES] for t in CRACK_TYPES], dtype=float)
+
+_TYPE_INDEX = pd.Index(CRACK_TYPES)
+_SEVERITY_INDEX = pd.Index(SEVERITIES)
+_TYPE_POSITION = {t: i for i, t in enumerate(CRACK_TYPES)}
+_SEVERITY_POSITION = {s: j for j, s in enumerate(SEVERITIES)}
+
+# What to do with crack types that have no curve: 'raise', 'nan' or 'zero'
+UNKNOWN_TYPE = 'raise'
+
+def deduct_values(types, densities, severities='Medium', unknown=UNKNOWN_TYPE):
+    """
+    Returns the deduct values for arrays of crack types and densities.
+
+    Parameters:
+    - types (array-like of str): Crack type of every row
+    - densities (array-like of float): Distress density as a percentage (0-100)
+    - severities (str or array-like of str): Severity level ('Low', 'Medium', 'High')
+    - unknown (str): Unsupported crack types 'raise' a ValueError, give 'nan' or 'zero'
+
+    Returns:
+    - np.ndarray: Deduct values (0-100)
+    """
+    if unknown not in ('raise', 'nan', 'zero'):
+        raise ValueError(f"Unsupported unknown option: {unknown}. Available options: ['raise', 'nan', 'zero']")
+
+    type_idx = _TYPE_INDEX.get_indexer(np.asarray(types, dtype=object).ravel())
+    unknown_type = type_idx < 0
+    if unknown == 'raise' and unknown_type.any():
+        crack_type = np.asarray(types, dtype=object).ravel()[unknown_type][0]
+        raise ValueError(f"Unsupported crack type: {crack_type}. Available types: {CRACK_TYPES}")
+
+    severity_idx = _SEVERITY_INDEX.get_indexer(np.atleast_1d(np.asarray(severities, dtype=object)))
+    if (severity_idx < 0).any():
+        severity = np.atleast_1d(np.asarray(severities, dtype=object))[severity_idx < 0][0]
+        raise ValueError(f"Unsupported severity: {severity}. Available severities: {SEVERITIES}")
+
+    # Cap density between 0 and 100 (NaN ends up as 100, like max(0, min(100, d)))
+    densities = np.asarray(densities, dtype=float).ravel()
+    densities = np.where(densities < 100, densities, 100)
+    densities = np.where(densities > 0, densities, 0)
+
+    # Get parameters for every row (unknown types read row 0, replaced below)
+    t = np.where(unknown_type, 0, type_idx)
+    Dmax, k, x0 = DMAX[t, severity_idx], K[t, severity_idx], X0[t, severity_idx]
+
+    # Logistic function
+    deduct_value = np.round(Dmax / (1 + np.exp(-k * (densities - x0))), 2)
+
+    if unknown_type.any():
+        deduct_value[unknown_type] = np.nan if unknown == 'nan' else 0.0
+    return deduct_value
 
 def get_deduct_value(crack_type: str, density: float, severity: str = 'Medium') -> float:
     """
@@ -12,81 +131,19 @@ def get_deduct_value(crack_type: str, density: float, severity: str = 'Medium')
     Returns:
     - float: Deduct value (0-100)
     """
-    
-    # Define logistic curve parameters for each crack type and severity
-    crack_curves = {
-        'Rutting': {
-            'Low':    {'Dmax': 40, 'k': 0.15, 'x0': 35},
-            'Medium': {'Dmax': 60, 'k': 0.20, 'x0': 30},
-            'High':   {'Dmax': 80, 'k': 0.25, 'x0': 25}
-        },
-        'Reflective & Transverse Crack': {
-            'Low':    {'Dmax': 35, 'k': 0.14, 'x0': 40},
-            'Medium': {'Dmax': 55, 'k': 0.18, 'x0': 35},
-            'High':   {'Dmax': 75, 'k': 0.22, 'x0': 30}
-        },
-        'Block Crack': {
-            'Low':    {'Dmax': 45, 'k': 0.16, 'x0': 30},
-            'Medium': {'Dmax': 65, 'k': 0.20, 'x0': 25},
-            'High':   {'Dmax': 85, 'k': 0.24, 'x0': 20}
-        },
-        'Longitudinal Crack': {
-            'Low':    {'Dmax': 35, 'k': 0.15, 'x0': 35},
-            'Medium': {'Dmax': 55, 'k': 0.18, 'x0': 30},
-            'High':   {'Dmax': 75, 'k': 0.22, 'x0': 25}
-        },
-        'Alligator Crack': {
-            'Low':    {'Dmax': 45, 'k': 0.15, 'x0': 30},
-            'Medium': {'Dmax': 65, 'k': 0.20, 'x0': 25},
-            'High':   {'Dmax': 85, 'k': 0.25, 'x0': 20}
-        },
-        'Patching': {
-            'Low':    {'Dmax': 30, 'k': 0.12, 'x0': 40},
-            'Medium': {'Dmax': 50, 'k': 0.16, 'x0': 35},
-            'High':   {'Dmax': 70, 'k': 0.20, 'x0': 30}
-        },
-        'Potholes': {
-            'Low':    {'Dmax': 50, 'k': 0.20, 'x0': 25},
-            'Medium': {'Dmax': 70, 'k': 0.25, 'x0': 20},
-            'High':   {'Dmax': 90, 'k': 0.30, 'x0': 15}
-        },
-        'Bleeding': {
-            'Low':    {'Dmax': 25, 'k': 0.10, 'x0': 45},
-            'Medium': {'Dmax': 45, 'k': 0.14, 'x0': 40},
-            'High':   {'Dmax': 65, 'k': 0.18, 'x0': 35}
-        },
-        'Corrugation': {
-            'Low':    {'Dmax': 35, 'k': 0.13, 'x0': 40},
-            'Medium': {'Dmax': 55, 'k': 0.17, 'x0': 35},
-            'High':   {'Dmax': 75, 'k': 0.21, 'x0': 30}
-        },
-        'Raveling & Weathering': {
-            'Low':    {'Dmax': 30, 'k': 0.11, 'x0': 45},
-            'Medium': {'Dmax': 50, 'k': 0.15, 'x0': 40},
-            'High':   {'Dmax': 70, 'k': 0.19, 'x0': 35}
-        },
-        'Bumps & Sags': {
-            'Low':    {'Dmax': 40, 'k': 0.14, 'x0': 35},
-            'Medium': {'Dmax': 60, 'k': 0.18, 'x0': 30},
-            'High':   {'Dmax': 80, 'k': 0.22, 'x0': 25}
-        },
-    }
-    
-    if crack_type not in crack_curves:
-        available_types = list(crack_curves.keys())
-        raise ValueError(f"Unsupported crack type: {crack_type}. Available types: {available_types}")
-    
-    if severity not in crack_curves[crack_type]:
-        available_severities = list(crack_curves[crack_type].keys())
-        raise ValueError(f"Unsupported severity: {severity}. Available severities: {available_severities}")
-    
+    if crack_type not in _TYPE_POSITION:
+        raise ValueError(f"Unsupported crack type: {crack_type}. Available types: {CRACK_TYPES}")
+
+    if severity not in _SEVERITY_POSITION:
+        raise ValueError(f"Unsupported severity: {severity}. Available severities: {SEVERITIES}")
+
     # Cap density between 0 and 100
     density = max(0, min(100, density))
-    
-    # Get parameters for the specific crack type and severity
-    params = crack_curves[crack_type][severity]
-    Dmax, k, x0 = params['Dmax'], params['k'], params['x0']
-    
+
+    # Same table as deduct_values (a one row array call is slower for a single value)
+    i, j = _TYPE_POSITION[crack_type], _SEVERITY_POSITION[severity]
+    Dmax, k, x0 = DMAX[i, j], K[i, j], X0[i, j]
+
     # Logistic function
     deduct_value = Dmax / (1 + np.exp(-k * (density - x0)))
-    return round(deduct_value, 2)
\ No newline at end of file
+    return round(deduct_value, 2)
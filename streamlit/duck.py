@@ -0,0 +1,249 @@
+# DuckDB backend of the dashboard (DASHBOARD_SOURCE=duckdb)
+# Same methods as the Cassandra class, but the analytics run as SQL in DuckDB over the
+# Parquet cracks (scripts/snapshot_export.py) and the road layer: filters, the join to
+# the roads, the group-bys and the PCI itself. Pandas only gets the results
+# (one row per road for the PCI), the road geometries are joined last (join_roads).
+import os
+from datetime import datetime, time
+import duckdb
+import pandas as pd
+from db import join_roads
+from pci import ROAD_WIDTH, CONDITION_BINS, CONDITION_LABELS
+from deduct_value_func import CRACK_CURVES, CRACK_TYPES, UNKNOWN_TYPE
+from roads import get_roads, ROADS_INDEX, ROADS_GEOJSON
+from road_index import RoadIndex
+from snapshot import SNAPSHOT_DIR
+
+# Parquet files of the crack table (hive partitions dist=<dist>/month=<YYYY-MM>)
+DUCKDB_CRACKS = os.getenv("DUCKDB_CRACKS", SNAPSHOT_DIR + "/**/*.parquet")
+
+# ":memory:" or a database file (keeps the road table between restarts)
+DUCKDB_DATABASE = os.getenv("DUCKDB_DATABASE", ":memory:")
+
+def load_spatial(con):
+  """Loads the spatial extension (installs it first if needed), False if it is not available"""
+  for statements in (["LOAD spatial"], ["INSTALL spatial", "LOAD spatial"]):
+    try:
+      for statement in statements:
+        con.execute(statement)
+      return True
+    except duckdb.Error:
+      pass
+  return False
+
+def unknown_deduct_value(unknown=UNKNOWN_TYPE):
+  """SQL deduct value of a crack type with no curve (c.label), as deduct_values does it"""
+  if unknown == 'raise':
+    return "error('Unsupported crack type: ' || coalesce(c.label, 'NULL'))"
+  elif unknown == 'nan':
+    return "'NaN'::DOUBLE"
+  elif unknown == 'zero':
+    return "0.0"
+  raise ValueError(f"Unsupported unknown option: {unknown}. Available options: ['raise', 'nan', 'zero']")
+
+def pci_query(where, unknown=UNKNOWN_TYPE):
+  """
+  SQL of the PCI of every road (road_index, cracks, pci, condition) from the cracks
+  matching `where`. Same formulas as pci.py: density capped to 0-100, medium severity
+  deduct values rounded to 2 decimals, CDV correction for more than one crack.
+  Crack types with no curve are handled like deduct_values (UNKNOWN_TYPE: the query
+  fails, or they deduct NaN / 0). DuckDB rounds and sums the deduct values in another
+  order than pandas, so a PCI can differ from pci_table by up to 0.01.
+  """
+  condition = " ".join(f"WHEN pci >= {b} THEN '{label}'" for b, label in zip(CONDITION_BINS, CONDITION_LABELS))
+  return f"""
+    WITH dv AS (
+      SELECT c.road_index,
+        CASE WHEN k.label IS NULL THEN {unknown_deduct_value(unknown)} ELSE
+          round(k.dmax / (1 + exp(-k.k * (greatest(0, least(100, coalesce(
+            abs(c.x2 - c.x1) / c.ppm * abs(c.y2 - c.y1) / c.ppm / (r.length_m * {ROAD_WIDTH}) * 100,
+          100))) - k.x0))), 2)
+        END AS dv
+      FROM crack c
+      LEFT JOIN roads r ON r.road_index = c.road_index
+      LEFT JOIN curves k ON k.label = c.label
+      WHERE c.road_index != -1 AND {where}
+    ), per_road AS (
+      SELECT road_index, count(*) AS cracks, sum(dv) AS tdv, max(dv) AS dv_max
+      FROM dv GROUP BY road_index
+    ), pci AS (
+      -- NaN deduct values (unknown = 'nan') give what pci.py gives: NaN for one crack, 0 for more
+      SELECT road_index, cracks::INTEGER AS cracks, round(CASE
+        WHEN cracks = 1 THEN 100 - dv_max
+        WHEN isnan(tdv) THEN 0
+        WHEN tdv <= 100 THEN greatest(0, 100 - (tdv - tdv * tdv / 250))
+        ELSE 10 * sqrt(tdv - 100)
+      END, 2) AS pci
+      FROM per_road
+    )
+    SELECT road_index, cracks, pci, CASE WHEN isnan(pci) THEN 'Failed' {condition} ELSE 'Failed' END AS condition FROM pci
+  """
+
+class DuckDB:
+  def __init__(self, cracks=DUCKDB_CRACKS, database=DUCKDB_DATABASE, roads=None):
+    print(f"Opening duckdb on {cracks} ...")
+
+    self.con = duckdb.connect(database)
+    self.spatial = load_spatial(self.con)
+
+    # hive partitions: filters on dist and month skip whole directories
+    self.con.execute(f"""
+      CREATE OR REPLACE VIEW crack AS
+      SELECT * FROM read_parquet('{cracks}', hive_partitioning = true, hive_types = {{'dist': VARCHAR, 'month': VARCHAR}})
+    """)
+
+    # deduct value curves (medium severity) by crack type
+    curves = pd.DataFrame(
+      [(t, c['Medium']['Dmax'], c['Medium']['k'], c['Medium']['x0']) for t, c in CRACK_CURVES.items()],
+      columns=['label', 'dmax', 'k', 'x0']
+    )
+    self.con.register('curves_df', curves)
+    self.con.execute("CREATE OR REPLACE TABLE curves AS SELECT * FROM curves_df")
+    self.con.unregister('curves_df')
+
+    self.load_roads(roads)
+    print(f"Duckdb ready (spatial extension: {'yes' if self.spatial else 'no'})")
+
+  def load_roads(self, roads=None):
+    """
+    roads table: road_index and metric length (EPSG:3857) of every road, from `roads`
+    (a DataFrame or Arrow table with these columns) or from the road layer
+    """
+    if roads is None and os.path.exists(ROADS_INDEX):
+      # the road index artifact already has the lengths
+      roads = RoadIndex.load(ROADS_INDEX).table.select(['road_index', 'length_m'])
+    elif roads is None and self.spatial:
+      # ST_Read keeps the order of geo.geojson, which is the road_index numbering
+      self.con.execute("""
+        CREATE OR REPLACE TABLE roads AS
+        SELECT (row_number() OVER () - 1)::INTEGER AS road_index,
+          ST_Length(ST_Transform(geom, 'EPSG:4326', 'EPSG:3857', always_xy := true)) AS length_m
+        FROM ST_Read(?)
+      """, [ROADS_GEOJSON])
+      return
+    elif roads is None:
+      roads_df = get_roads()
+      roads = pd.DataFrame({
+        'road_index': roads_df['road_index'].to_numpy(),
+        'length_m': roads_df.geometry.to_crs("EPSG:3857").length.to_numpy()
+      })
+
+    self.con.register('roads_src', roads)
+    self.con.execute("CREATE OR REPLACE TABLE roads AS SELECT road_index, length_m FROM roads_src")
+    self.con.unregister('roads_src')
+
+  def query(self, query, params=None):
+    # one cursor per query: streamlit runs the sessions in different threads
+    return self.con.cursor().execute(query, params or []).df()
+
+  def exec(self, query, params=None):
+    """Runs a SQL query (the crack view has the columns of the crack table), ? placeholders for params"""
+    try:
+      return self.query(query, params)
+    except:
+      return "Error in the duckdb query"
+
+  def exec_pci_query(self, query, params=None):
+    """Like exec for the PCI queries: a crack type with no curve raises a ValueError, like pci_table"""
+    try:
+      return self.query(query, params)
+    except duckdb.Error as e:
+      message = str(e)
+      if 'Unsupported crack type' in message:
+        raise ValueError(f"{message[message.index('Unsupported crack type'):]}. Available types: {CRACK_TYPES}") from None
+      return "Error in the duckdb query"
+
+  @staticmethod
+  def select_list(columns, alias=''):
+    if columns.strip() == '*':
+      return f"{alias}* EXCLUDE (month)"
+    return ", ".join(alias + c.strip() for c in columns.split(','))
+
+  @staticmethod
+  def where(filters, alias=''):
+    """Dashboard filters (districts, confidence, start_date, end_date) as SQL and params"""
+    start = datetime.combine(filters['start_date'], time(0, 0, 0))
+    end = datetime.combine(filters['end_date'], time(23, 59, 59))
+    months = pd.period_range(filters['start_date'], filters['end_date'], freq='M').strftime('%Y-%m').tolist()
+    dists = list(filters['districts'])
+
+    sql = f"""{alias}dist IN ({', '.join('?' * len(dists)) or 'NULL'})
+      AND {alias}month IN ({', '.join('?' * len(months)) or 'NULL'})
+      AND {alias}timestamp BETWEEN ? AND ?
+      AND {alias}confidence >= ?"""
+    return sql, dists + months + [start, end, float(filters['confidence'])]
+
+  def exec_all(self, columns):
+    """Columns of every crack (no filters)"""
+    return self.exec(f"SELECT {self.select_list(columns)} FROM crack")
+
+  def exec_filtered(self, columns, filters):
+    """Cracks matching the dashboard filters (newest first), only the given columns ("*" for all)"""
+    where, params = self.where(filters)
+    return self.exec(f"SELECT {self.select_list(columns)} FROM crack WHERE {where} ORDER BY timestamp DESC", params)
+
+  def exec_rollup(self, filters):
+    """Crack counts (cracks) and areas (area_m2) per road_index and label"""
+    where, params = self.where(filters)
+    return self.exec(f"""
+      SELECT road_index, label, count(*)::INTEGER AS cracks,
+        sum(abs(x2 - x1) * abs(y2 - y1) / (ppm * ppm)) AS area_m2
+      FROM crack WHERE {where}
+      GROUP BY road_index, label
+    """, params)
+
+  def exec_pci(self, columns, filters):
+    """
+    Cracks matching the dashboard filters with the pci and condition of their road
+    (the same frame as calc_pci(join_roads(exec_filtered(columns, filters))))
+    """
+    where, params = self.where(filters, 'c.')
+    data = self.exec_pci_query(f"""
+      WITH road_pci AS ({pci_query(where)})
+      SELECT {self.select_list(columns, 'c.')}, p.pci, p.condition
+      FROM crack c LEFT JOIN road_pci p ON p.road_index = c.road_index
+      WHERE {where}
+    """, params + params)
+    if not isinstance(data, pd.DataFrame):
+      return data
+
+    return join_roads(data)
+
+  def exec_road_pci(self, filters):
+    """One row per road with the pci, condition and number of the cracks matching the dashboard filters"""
+    where, params = self.where(filters, 'c.')
+    data = self.exec_pci_query(pci_query(where), params)
+    if not isinstance(data, pd.DataFrame):
+      return data
+
+    return join_roads(data)
+
+  def newest_update(self, dist):
+    # the parquet files do not change while they are read
+    return None
+
+  def road_pci(self, dists):
+    """PCI of every road in the districts from all their cracks (like the road_pci table)"""
+    dists = list(dists)
+    data = self.exec_pci_query(pci_query(f"c.dist IN ({', '.join('?' * len(dists)) or 'NULL'})"), dists)
+    if not isinstance(data, pd.DataFrame) or data.empty:
+      return pd.DataFrame()
+
+    return join_roads(data)
+
+  def filter_options(self):
+    """Districts, confidence range and date range of all the cracks"""
+    data = self.query("""
+      SELECT list(DISTINCT dist ORDER BY dist) AS districts,
+        min(confidence) AS min_conf, max(confidence) AS max_conf,
+        min(timestamp) AS min_ts, max(timestamp) AS max_ts
+      FROM crack
+    """).iloc[0]
+
+    return {
+      'districts': list(data['districts'] if data['districts'] is not None else []),
+      'min_confidence': float(data['min_conf']),
+      'max_confidence': float(data['max_conf']),
+      'min_date': pd.to_datetime(data['min_ts']).date(),
+      'max_date': pd.to_datetime(data['max_ts']).date()
+    }
@@ -0,0 +1,332 @@
+# Images of the "Detection Results" viewer (page 1)
+# Originals downloaded from the data lake, their thumbnails and the annotated renders are
+# kept in a local disk cache (least recently used files go first when it is full), so
+# browsing detections downloads every image once.
+#   - downloads are ranged: an interrupted download resumes where it stopped
+#   - a cached original is revalidated with its ETag (conditional fetch, nothing is
+#     downloaded again while it has not changed)
+#   - the boxes of all the detections are drawn at once with numpy (only the text is per box),
+#     the same pixels as cv2 drawing them one by one
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+import pandas as pd
+
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "../data/image_cache")
+IMAGE_CACHE_MB = int(os.getenv("IMAGE_CACHE_MB", "500"))
+IMAGE_REVALIDATE_S = 24 * 3600   # images never change once uploaded, check them once a day
+IMAGE_CHUNK = 1 << 20            # bytes per ranged request
+THUMBNAIL_SIZE = 256             # px, longest side
+DOWNLOAD_LOCKS = 64              # striped locks: one download of a blob at a time
+BOX_COLOR = (0, 255, 0)          # BGR
+BOX_THICKNESS = 2
+
+def _read_text(path):
+  """Content of a small text file (an ETag), None if it does not exist"""
+  try:
+    with open(path) as f:
+      return f.read()
+  except FileNotFoundError:
+    return None
+
+def _key(*parts):
+  # image names have ':' (timestamps), not allowed in windows file names
+  return hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()
+
+class DiskLRU:
+  """Files in a folder with a size limit, the least recently used are deleted first"""
+
+  def __init__(self, folder=IMAGE_CACHE_DIR, max_mb=IMAGE_CACHE_MB):
+    self.folder = folder
+    self.max_bytes = max_mb * 1e6
+    self._lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+    os.makedirs(folder, exist_ok=True)
+
+    # last use is the file mtime (touched on every hit), so the order survives restarts
+    files = []
+    for root, _, names in os.walk(folder):
+      for name in names:
+        if not name.endswith(('.part', '.etag', '.tmp')):
+          path = os.path.join(root, name)
+          stat = os.stat(path)
+          files.append((stat.st_mtime, path, stat.st_size))
+    self.files = OrderedDict((path, size) for _, path, size in sorted(files))
+    self.size = sum(self.files.values())
+
+  def path(self, kind, key, ext):
+    return os.path.join(self.folder, kind, key[:2], f"{key}{ext}")
+
+  def get(self, path):
+    """Bytes of a cached file (None if not cached)"""
+    with self._lock:
+      if path not in self.files:
+        self.misses += 1
+        return None
+      self.files.move_to_end(path)
+      self.hits += 1
+    try:
+      os.utime(path)
+      with open(path, 'rb') as f:
+        return f.read()
+    except OSError:
+      self.forget(path)
+      return None
+
+  def put(self, path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as f:
+      f.write(data)
+    os.replace(tmp, path)
+    self.add(path, len(data))
+
+  def add(self, path, size):
+    """Registers a file written in the cache folder, then evicts if the cache is too big"""
+    with self._lock:
+      self.size += size - self.files.get(path, 0)
+      self.files[path] = size
+      self.files.move_to_end(path)
+
+      while self.size > self.max_bytes and len(self.files) > 1:
+        old, old_size = self.files.popitem(last=False)
+        self.size -= old_size
+        for stale in (old, old + '.etag'):
+          try:
+            os.remove(stale)
+          except OSError:
+            pass
+
+  def __contains__(self, path):
+    with self._lock:
+      return path in self.files
+
+  def forget(self, path):
+    with self._lock:
+      self.size -= self.files.pop(path, 0)
+
+  def stats(self):
+    with self._lock:
+      return {"files": len(self.files), "size_mb": round(self.size / 1e6, 2), "hits": self.hits, "misses": self.misses}
+
+def _ranges(starts, stops):
+  """Concatenated np.arange(start, stop) of every pair, and the pair of every value"""
+  lengths = np.maximum(stops - starts, 0)
+  owner = np.repeat(np.arange(len(starts)), lengths)
+  offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+  return starts[owner] + offsets, owner
+
+def rect_pixels(shape, x1, y1, x2, y2):
+  """(rows, cols, rectangle) of the pixels of the rectangles [x1, x2] x [y1, y2] (arrays, inclusive like cv2)"""
+  h, w = shape[:2]
+  x1, x2 = np.clip(x1, 0, w), np.clip(np.asarray(x2) + 1, 0, w)
+  y1, y2 = np.clip(y1, 0, h), np.clip(np.asarray(y2) + 1, 0, h)
+
+  # one entry per (rectangle, row), then one per pixel
+  rows, rect = _ranges(y1, y2)
+  cols, row = _ranges(x1[rect], x2[rect])
+  return rows[row], cols, rect[row]
+
+def text_pixels(shape, text, x, y):
+  """(rows, cols) of the pixels cv2.putText changes for a label at (x, y)"""
+  (tw, th), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+  # drawn in a small mask around the text (same pixels, shifted), not on the whole image
+  left, top = x - 2, y - th - 2
+  mask = np.zeros((th + baseline + 5, tw + 5), np.uint8)
+  cv2.putText(mask, text, (x - left, y - top), cv2.FONT_HERSHEY_SIMPLEX, 0.5, 255, 1)
+  rows, cols = np.nonzero(mask)
+  rows, cols = rows + top, cols + left
+  inside = (rows >= 0) & (rows < shape[0]) & (cols >= 0) & (cols < shape[1])
+  return rows[inside], cols[inside]
+
+def _draw_one_by_one(image, x1, y1, x2, y2, texts, thickness, color, text_color):
+  for text, bx1, by1, bx2, by2 in zip(texts, x1.tolist(), y1.tolist(), x2.tolist(), y2.tolist()):
+    cv2.rectangle(image, (bx1, by1), (bx2, by2), color, thickness)
+    (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+    cv2.rectangle(image, (bx1, by1 - th - 4), (bx1 + tw, by1), color, -1)
+    cv2.putText(image, text, (bx1, by1 - 4), cv2.FONT_HERSHEY_SIMPLEX, 0.5, text_color, 1)
+
+def draw_detections(image, detections, thickness=BOX_THICKNESS, color=BOX_COLOR, text_color=(0, 0, 0)):
+  """
+  Image (BGR) with the boxes, labels and confidences of the detections, the same pixels
+  as drawing them one by one with cv2 (box, label background, text, then the next box)
+  """
+  image = image.copy()
+  if detections.empty:
+    return image
+
+  n = len(detections)
+  x1, x2 = detections['x1'].to_numpy().astype(int), detections['x2'].to_numpy().astype(int)
+  y1, y2 = detections['y1'].to_numpy().astype(int), detections['y2'].to_numpy().astype(int)
+
+  labels = detections['label'].astype(str).to_numpy() if 'label' in detections.columns else np.full(n, "unknown", dtype=object)
+  confidences = detections['confidence'].to_numpy() if 'confidence' in detections.columns else np.full(n, np.nan)
+  texts = [f"{label} ({conf:.2f})" if pd.notna(conf) else label for label, conf in zip(labels, confidences)]
+  sizes = {text: cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)[0] for text in set(texts)}
+  tw = np.array([sizes[text][0] for text in texts])
+  th = np.array([sizes[text][1] for text in texts])
+
+  if thickness != 2:
+    # the sides below are the pixels of cv2's thickness 2 lines (round corners)
+    _draw_one_by_one(image, x1, y1, x2, y2, texts, thickness, color, text_color)
+    return image
+
+  # the 4 sides (3 px wide, the outer corner pixel is not drawn) and the label background
+  # of every box as inclusive rectangles, rectangle r is box r % n
+  rows, cols, rect = rect_pixels(
+    image.shape,
+    np.concatenate([x1, x1, x1 - 1, x2 - 1, x1]),
+    np.concatenate([y1 - 1, y2 - 1, y1, y1, y1 - th - 4]),
+    np.concatenate([x2, x2, x1 + 1, x2 + 1, x1 + tw]),
+    np.concatenate([y1 + 1, y2 + 1, y2, y2, y1]),
+  )
+
+  # the fills are all the same color, so their order does not matter, but a text is
+  # covered by the boxes drawn after it: last box drawing each pixel
+  width = image.shape[1]
+  pixels = rows * width + cols
+  order = np.argsort(rect % n, kind='stable')[::-1]
+  filled, first = np.unique(pixels[order], return_index=True)
+  last_box = (rect % n)[order][first]
+
+  text_pixels_of = [text_pixels(image.shape, text, int(x), int(y) - 4) for text, x, y in zip(texts, x1, y1)]
+  for i, (r, c) in enumerate(text_pixels_of):
+    p = r * width + c
+    at = np.clip(np.searchsorted(filled, p), 0, len(filled) - 1)
+    if (last_box[at][filled[at] == p] > i).any():
+      # a later box covers this text: draw in order, like the old loop
+      _draw_one_by_one(image, x1, y1, x2, y2, texts, thickness, color, text_color)
+      return image
+
+  # no overlaps: all the fills at once, then the texts in order
+  image[rows, cols] = color
+  for text, x, y in zip(texts, x1, y1):
+    cv2.putText(image, text, (int(x), int(y) - 4), cv2.FONT_HERSHEY_SIMPLEX, 0.5, text_color, 1)
+  return image
+
+class ImageService:
+  """Originals, thumbnails and annotated renders of the uploaded images"""
+
+  def __init__(self, container_client, prefix="raw/", cache=None):
+    self.container = container_client
+    self.prefix = prefix
+    self.cache = cache if cache is not None else DiskLRU()
+    self.downloaded_bytes = 0
+    # the service is shared by every session: two of them missing the same image must
+    # not append to the same .part file (a lock per key, striped to bound the memory)
+    self._download_locks = [threading.Lock() for _ in range(DOWNLOAD_LOCKS)]
+
+  def _download_lock(self, key):
+    return self._download_locks[int(key[:8], 16) % DOWNLOAD_LOCKS]
+
+  def _download(self, name, path):
+    """Ranged download of the blob to path (resumes a partial .part file), returns its ETag"""
+    from azure.core import MatchConditions
+
+    blob = self.container.get_blob_client(f"{self.prefix}{name}")
+    properties = blob.get_blob_properties()
+    part = f"{path}.part"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # a partial file of another version of the blob cannot be resumed
+    etag_file = f"{part}.etag"
+    if os.path.exists(part) and _read_text(etag_file) != properties.etag:
+      os.remove(part)
+    with open(etag_file, 'w') as f:
+      f.write(properties.etag)
+
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    with open(part, 'ab') as f:
+      while offset < properties.size:
+        length = min(IMAGE_CHUNK, properties.size - offset)
+        chunk = blob.download_blob(offset=offset, length=length, etag=properties.etag, match_condition=MatchConditions.IfNotModified).readall()
+        f.write(chunk)
+        offset += len(chunk)
+        self.downloaded_bytes += len(chunk)
+
+    os.replace(part, path)
+    os.remove(etag_file)
+    return properties.etag
+
+  def original(self, name):
+    """Encoded bytes of the original image (from the cache when it has not changed)"""
+    from azure.core import MatchConditions
+    from azure.core.exceptions import ResourceNotModifiedError
+
+    key = _key(name)
+    path = self.cache.path("originals", key, os.path.splitext(name)[1] or ".jpg")
+    etag_path = f"{path}.etag"
+    data = self.cache.get(path)
+
+    if data is not None:
+      etag = _read_text(etag_path)
+      if etag is None or time.time() - os.path.getmtime(etag_path) < IMAGE_REVALIDATE_S:
+        return data
+      try:
+        # conditional: only downloaded if the blob changed
+        self.container.get_blob_client(f"{self.prefix}{name}").get_blob_properties(etag=etag, match_condition=MatchConditions.IfModified)
+      except ResourceNotModifiedError:
+        os.utime(etag_path)
+        return data
+      except Exception:
+        # storage not reachable: the cached copy is better than nothing
+        return data
+
+    with self._download_lock(key):
+      # another session downloaded it while this one waited
+      if data is None and path in self.cache:
+        data = self.cache.get(path)
+        if data is not None:
+          return data
+
+      etag = self._download(name, path)
+      with open(etag_path, 'w') as f:
+        f.write(etag)
+      self.cache.add(path, os.path.getsize(path))
+      with open(path, 'rb') as f:
+        return f.read()
+
+  def image(self, name):
+    """Decoded original (BGR), None if it cannot be decoded"""
+    return cv2.imdecode(np.frombuffer(self.original(name), np.uint8), cv2.IMREAD_COLOR)
+
+  def thumbnail(self, name, size=THUMBNAIL_SIZE):
+    """Small JPEG of the image (RGB array) for galleries"""
+    path = self.cache.path("thumbnails", _key(name, size), ".jpg")
+    data = self.cache.get(path)
+    if data is None:
+      image = self.image(name)
+      if image is None:
+        return None
+      scale = size / max(image.shape[:2])
+      if scale < 1:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+      data = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes()
+      self.cache.put(path, data)
+
+    return cv2.cvtColor(cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB)
+
+  def annotated(self, name, detections):
+    """Image with its detections drawn (RGB array), None if it cannot be decoded"""
+    # the render depends on the boxes too (other filters, other detections)
+    columns = [c for c in ['x1', 'y1', 'x2', 'y2', 'label', 'confidence'] if c in detections.columns]
+    boxes = detections[columns].sort_values(columns).to_csv(index=False)
+    path = self.cache.path("annotated", _key(name, boxes), ".png")
+
+    data = self.cache.get(path)
+    if data is None:
+      image = self.image(name)
+      if image is None:
+        return None
+      data = cv2.imencode(".png", draw_detections(image, detections))[1].tobytes()
+      self.cache.put(path, data)
+
+    return cv2.cvtColor(cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB)
+
+  def stats(self):
+    return {**self.cache.stats(), "downloaded_mb": round(self.downloaded_bytes / 1e6, 2)}
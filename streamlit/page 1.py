@@ -1,9 +1,9 @@
 import streamlit as st
-from db import Cassandra
+from db import connect, join_roads
 import plotly.express as px
 import numpy as np
 from azure.storage.blob import BlobServiceClient
-import cv2
+from images import ImageService
 from dotenv import load_dotenv
 import os
 from colors import DASHBOARD_PALETTE
@@ -18,6 +18,10 @@ sys.path.append('./utils')
 from header import title_page1
 from filters import FilterManager
 
+# thumbnails shown under the detection viewer
+THUMBNAILS = 12
+THUMBNAILS_PER_ROW = 6
+
 # Suppress warnings for cleaner output
 warnings.filterwarnings('ignore')
 
@@ -44,7 +48,7 @@ title_page1()
 # Initialize Cassandra connection with caching
 @st.cache_resource
 def get_cassandra():
-    return Cassandra()
+    return connect()
 
 cassandra = get_cassandra()
 
@@ -57,8 +61,11 @@ filter_manager.render_filters_sidebar()
 # Get current filters
 current_filters = filter_manager.get_current_filters()
 
-# Get filtered data
-filtered_data = filter_manager.get_filtered_data()
+# Get filtered data (only what the table, the detection viewer and the charts use, no geometry)
+filtered_data = filter_manager.get_filtered_data(
+    columns=['timestamp', 'dist', 'label', 'confidence', 'image', 'lat', 'lon', 'x1', 'y1', 'x2', 'y2'],
+    road_columns=['name', 'fclass']
+)
 
 if filtered_data is None:
     st.warning("Please configure filters in the sidebar")
@@ -67,8 +74,7 @@ if filtered_data is None:
 # Get data for road length calculation
 @st.cache_data(ttl=300)
 def get_road_data():
-    cassandra.exec("SELECT road_index, label FROM crack")
-    data2 = cassandra.join_roads()
+    data2 = join_roads(cassandra.exec_all("road_index, label"))
     
     # Check if geometry column exists
     if 'geometry' in data2.columns and hasattr(data2, 'to_crs'):
@@ -238,12 +244,14 @@ with st.container():
 
 # Image detection section ------------------------------------------------------------------
 @st.cache_resource
-def get_blob_service():
+def get_image_service():
+    # originals, thumbnails and annotated renders cached on disk (see images.py)
     load_dotenv()
     account_name = os.getenv("account_name")
     account_key = os.getenv("account_key")
     connection_string = f"DefaultEndpointsProtocol=https;AccountName={account_name};AccountKey={account_key};EndpointSuffix=core.windows.net"
-    return BlobServiceClient.from_connection_string(connection_string)
+    blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+    return ImageService(blob_service_client.get_container_client(os.getenv("file_system_name")))
 
 with st.container():
     st.markdown("### 🎯 Detection Results")
@@ -257,98 +265,82 @@ with st.container():
     if image_name:
         with st.spinner("Loading image and detections..."):
             try:
-                blob_service_client = get_blob_service()
-                file_system_name = os.getenv("file_system_name")
-                blob_client = blob_service_client.get_blob_client(
-                    container=file_system_name, 
-                    blob=f"raw/{image_name}"
-                )
+                image_service = get_image_service()
                 
-                image_data = blob_client.download_blob().readall()
-                nparr = np.frombuffer(image_data, np.uint8)
-                image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+                # Get detections for this image
+                image_column = None
+                for col in ['image', 'filename', 'img_name', 'image_name']:
+                    if col in filtered_data.columns:
+                        image_column = col
+                        break
                 
-                if image is None:
-                    st.error("Could not decode image. Please check the file name and format.")
+                if image_column:
+                    detections = filtered_data[filtered_data[image_column] == image_name]
                 else:
-                    # Get detections for this image
-                    image_column = None
-                    for col in ['image', 'filename', 'img_name', 'image_name']:
-                        if col in filtered_data.columns:
-                            image_column = col
+                    detections = filtered_data[filtered_data.astype(str).apply(
+                        lambda row: image_name in row.values, axis=1
+                    )]
+                
+                # Boxes need the 4 coordinates
+                coord_mapping = {
+                    'x1': ['x1', 'xmin', 'x_min'],
+                    'x2': ['x2', 'xmax', 'x_max'],
+                    'y1': ['y1', 'ymin', 'y_min'],
+                    'y2': ['y2', 'ymax', 'y_max']
+                }
+                coords = {}
+                for coord_key, possible_names in coord_mapping.items():
+                    for name in possible_names:
+                        if name in detections.columns:
+                            coords[name] = coord_key
                             break
+                
+                boxes = detections.rename(columns=coords) if len(coords) == 4 else detections.iloc[:0]
+                for col in ['class', 'type', 'crack_type']:
+                    if 'label' not in boxes.columns and col in boxes.columns:
+                        boxes = boxes.rename(columns={col: 'label'})
+                
+                # Annotated render (cached), the boxes are drawn at once
+                img_rgb = image_service.annotated(image_name, boxes)
+                
+                if img_rgb is None:
+                    st.error("Could not decode image. Please check the file name and format.")
+                elif not detections.empty:
+                    st.image(img_rgb, caption=f"Detections for {image_name}", use_container_width=True)
                     
-                    if image_column:
-                        detections = filtered_data[filtered_data[image_column] == image_name]
-                    else:
-                        detections = filtered_data[filtered_data.astype(str).apply(
-                            lambda row: image_name in row.values, axis=1
-                        )]
-                    
-                    if not detections.empty:
-                        img_annotated = image.copy()
-                        for _, row in detections.iterrows():
-                            # Get coordinates
-                            coord_mapping = {
-                                'x1': ['x1', 'xmin', 'x_min'],
-                                'x2': ['x2', 'xmax', 'x_max'],
-                                'y1': ['y1', 'ymin', 'y_min'],
-                                'y2': ['y2', 'ymax', 'y_max']
-                            }
-                            
-                            coords = {}
-                            for coord_key, possible_names in coord_mapping.items():
-                                for name in possible_names:
-                                    if name in row:
-                                        coords[coord_key] = int(row[name])
-                                        break
-                            
-                            if len(coords) == 4:
-                                x1, x2, y1, y2 = coords['x1'], coords['x2'], coords['y1'], coords['y2']
-                                
-                                # Get label
-                                label_col = None
-                                for col in ['label', 'class', 'type', 'crack_type']:
-                                    if col in row:
-                                        label_col = col
-                                        break
-                                label = row[label_col] if label_col else "unknown"
-                                
-                                conf = row.get('confidence')
-                                
-                                # Draw rectangle
-                                cv2.rectangle(img_annotated, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                                
-                                # Add label
-                                text = f"{label}"
-                                if pd.notna(conf):
-                                    text += f" ({conf:.2f})"
-                                
-                                (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
-                                cv2.rectangle(img_annotated, (x1, y1 - th - 4), (x1 + tw, y1), (0, 255, 0), -1)
-                                cv2.putText(img_annotated, text, (x1, y1 - 4), 
-                                          cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
-                        
-                        img_rgb = cv2.cvtColor(img_annotated, cv2.COLOR_BGR2RGB)
-                        st.image(img_rgb, caption=f"Detections for {image_name}", use_container_width=True)
-                        
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.info(f"**Total detections:** {len(detections)}")
-                        with col2:
-                            label_col = None
-                            for col in ['label', 'class', 'type']:
-                                if col in detections.columns:
-                                    label_col = col
-                                    break
-                            if label_col:
-                                unique_labels = detections[label_col].unique()
-                                st.info(f"**Crack types:** {', '.join(map(str, unique_labels))}")
-                    else:
-                        st.warning(f"No detections found for image: {image_name}")
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.info(f"**Total detections:** {len(detections)}")
+                    with col2:
+                        label_col = None
+                        for col in ['label', 'class', 'type']:
+                            if col in detections.columns:
+                                label_col = col
+                                break
+                        if label_col:
+                            unique_labels = detections[label_col].unique()
+                            st.info(f"**Crack types:** {', '.join(map(str, unique_labels))}")
+                else:
+                    st.warning(f"No detections found for image: {image_name}")
                         
             except Exception as e:
                 st.error(f"Error loading image: {str(e)}")
+    
+    # Thumbnails of the most recent detections (small cached JPEGs, not the originals)
+    # only when asked: streamlit runs the body of a collapsed expander on every rerun
+    if not filtered_data.empty and 'image' in filtered_data.columns:
+        if st.toggle("🖼️ Show recent images", value=False):
+            # filtered_data is newest first
+            recent_images = filtered_data['image'].dropna().drop_duplicates().head(THUMBNAILS)
+            cols = st.columns(THUMBNAILS_PER_ROW)
+            for i, name in enumerate(recent_images):
+                with cols[i % THUMBNAILS_PER_ROW]:
+                    try:
+                        thumbnail = get_image_service().thumbnail(name)
+                        if thumbnail is not None:
+                            st.image(thumbnail, caption=name, use_container_width=True)
+                    except Exception as e:
+                        st.caption(f"{name}: {e}")
 
 # Charts section ---------------------------------------------------------------------------
 with st.container():
@@ -1,6 +1,7 @@
 import streamlit as st
 import pydeck as pdk
-from db import Cassandra
+from db import connect, calc_road_pci
+from tiles import crack_cells, road_layer, fit_view, DETAIL_ZOOM
 import json
 import matplotlib.pyplot as plt
 import contextily as ctx
@@ -40,7 +41,7 @@ simple_header("Cracks Heatmap & Road Conditions", "Interactive maps showing crac
 # Initialize Cassandra connection
 @st.cache_resource
 def get_cassandra():
-    return Cassandra()
+    return connect()
 
 cassandra = get_cassandra()
 
@@ -77,29 +78,13 @@ st.title("🌡️ Cracks heatmap")
 
 # Query with current filters
 if current_filters['districts'] and current_filters['start_date'] and current_filters['end_date']:
-    dists_filter = ", ".join([f"'{d}'" for d in current_filters['districts']])
-    start_iso = f"{current_filters['start_date'].isoformat()} 00:00:00"
-    end_iso = f"{current_filters['end_date'].isoformat()} 23:59:59"
-    
-    query = f"""
-        SELECT lon, lat, confidence, label, timestamp, image 
-        FROM crack 
-        WHERE dist IN ({dists_filter}) 
-        AND confidence >= {current_filters['confidence']}
-        AND timestamp >= '{start_iso}' 
-        AND timestamp <= '{end_iso}' 
-        ALLOW FILTERING
-    """
-    
-    cassandra.exec(query)
-    data = cassandra.data.copy()
+    data = cassandra.exec_filtered("lon, lat, confidence, label, timestamp, image", current_filters)
     
     if not data.empty and 'timestamp' in data.columns:
         data['timestamp'] = pd.to_datetime(data['timestamp']).dt.strftime("%Y-%m-%d %H:%M:%S")
 else:
     # Fallback to original query if no districts selected
-    cassandra.exec("SELECT lon, lat, confidence, label, timestamp, image FROM crack")
-    data = cassandra.data.copy()
+    data = cassandra.exec_all("lon, lat, confidence, label, timestamp, image")
     if not data.empty and 'timestamp' in data.columns:
         data['timestamp'] = data['timestamp'].dt.strftime("%Y-%m-%d %H:%M:%S")
 
@@ -107,27 +92,35 @@ else:
 if data.empty:
     st.warning("No crack data available for the selected filters.")
     st.info("Showing heatmap without filters...")
-    cassandra.exec("SELECT lon, lat, confidence, label, timestamp, image FROM crack")
-    data = cassandra.data.copy()
+    data = cassandra.exec_all("lon, lat, confidence, label, timestamp, image")
     if not data.empty and 'timestamp' in data.columns:
         data['timestamp'] = pd.to_datetime(data['timestamp']).dt.strftime("%Y-%m-%d %H:%M:%S")
 
 if not data.empty:
-    # Initial view - EXACTLY AS BEFORE
+    # The map opens on all the cracks, binned into cells for the zoom (see tiles.py)
+    center_lat, center_lon, fit_zoom = fit_view(data['lon'].min(), data['lat'].min(), data['lon'].max(), data['lat'].max())
+    zoom = st.slider(
+        "Heatmap zoom",
+        min_value=10, max_value=DETAIL_ZOOM, value=max(10, fit_zoom),
+        help=f"Cracks are grouped into cells of a few pixels at this zoom (one by one from zoom {DETAIL_ZOOM})."
+    )
+    cells = crack_cells(data, zoom)
+
+    # Initial view
     view_state = pdk.ViewState(
-        latitude=data['lat'].iloc[0],
-        longitude=data['lon'].iloc[0],
-        zoom=15,
+        latitude=center_lat,
+        longitude=center_lon,
+        zoom=zoom,
         pitch=45
     )
 
-    # Heatmap layer - EXACTLY AS BEFORE
+    # Heatmap layer - a cell counts as all its cracks (summed confidence)
     heatmap_layer = pdk.Layer(
         "HeatmapLayer",
-        data=data,
+        data=cells,
         get_position=["lon", "lat"],
-        get_weight='confidence',
-        aggregation="MEAN",
+        get_weight='weight',
+        aggregation="SUM",
         radiusPixels=60,
         intensity=1.2,
         colorRange=[
@@ -142,7 +135,7 @@ if not data.empty:
     # Scatterplot layer for hover - EXACTLY AS BEFORE
     scatter_layer = pdk.Layer(
         "ScatterplotLayer",
-        data=data,
+        data=cells,
         get_position=["lon", "lat"],
         get_fill_color=[255, 140, 0],  # Color of points
         get_radius=1,
@@ -156,6 +149,7 @@ if not data.empty:
         initial_view_state=view_state,
         tooltip={
             "html": """
+            <b>Cracks:</b> {cracks} <br/>
             <b>Image:</b> {image} <br/>
             <b>Timestamp:</b> {timestamp} <br/>
             <b>Crack Type:</b> {label} <br/> 
@@ -179,32 +173,26 @@ else:
 st.markdown("---")
 st.title("🗺️ Roads PCI Map")
 
-# Query with current filters
-if current_filters['districts'] and current_filters['start_date'] and current_filters['end_date']:
-    dists_filter = ", ".join([f"'{d}'" for d in current_filters['districts']])
-    start_iso = f"{current_filters['start_date'].isoformat()} 00:00:00"
-    end_iso = f"{current_filters['end_date'].isoformat()} 23:59:59"
-    
-    query = f"""
-        SELECT x1,x2,y1,y2, road_index, label, ppm 
-        FROM crack 
-        WHERE dist IN ({dists_filter}) 
-        AND confidence >= {current_filters['confidence']}
-        AND timestamp >= '{start_iso}' 
-        AND timestamp <= '{end_iso}' 
-        ALLOW FILTERING
-    """
-    
-    cassandra.exec(query)
-    cassandra.join_roads()
-    cassandra.calc_pci()
-    data = cassandra.data.copy()
-else:
-    # Fallback to original query
-    cassandra.exec("SELECT x1,x2,y1,y2, road_index, label, ppm FROM crack")
-    cassandra.join_roads()
-    cassandra.calc_pci()
-    data = cassandra.data.copy()
+# Precomputed PCI (road_pci table, updated by the spark job) or computed from the filtered cracks
+live_pci = st.toggle(
+    "Live road PCI (all dates and confidences)",
+    value=False,
+    help="Reads the PCI kept up to date by the streaming job. It ignores the confidence and date filters, leave it off to compute the PCI from the cracks matching them."
+)
+
+data = pd.DataFrame()
+if live_pci and current_filters['districts']:
+    data = cassandra.road_pci(current_filters['districts'])
+
+# road_pci is empty until the spark job has processed some cracks, compute it from the cracks then
+# (one row per road either way: each road geometry is sent once, not once per crack)
+if data.empty:
+    # Query with current filters
+    if current_filters['districts'] and current_filters['start_date'] and current_filters['end_date']:
+        data = cassandra.exec_road_pci(current_filters)
+    else:
+        # Fallback to original query
+        data = calc_road_pci(cassandra.exec_all("x1,x2,y1,y2, road_index, label, ppm"))
 
 if not data.empty:
     # Color map - EXACTLY AS BEFORE
@@ -279,13 +267,24 @@ if not data.empty:
                 unsafe_allow_html=True
             )
 
-    geojson_data = json.loads(data.to_json())
+    # Define view: every road of the data in the map
+    latitude, longitude, zoom = fit_view(*data.total_bounds)
+    view_state = pdk.ViewState(
+        latitude=latitude,
+        longitude=longitude,
+        zoom=zoom
+    )
+
+    # Road geometries simplified for the zoom, all the roads are sent (see tiles.py)
+    map_data = road_layer(data, view_state.zoom)
+    geojson_data = json.loads(map_data.to_json())
 
     tooltip = {
         "html": """
             <b>Street:</b> {name}<br>
             <b>Condition:</b> {condition}<br>
             <b>PCI:</b> {pci}<br>
+            <b>Cracks:</b> {cracks}<br>
         """,
         "style": {
             "backgroundColor": "steelblue",
@@ -304,13 +303,6 @@ if not data.empty:
         auto_highlight=True
     )
 
-    # Define view - EXACTLY AS BEFORE
-    view_state = pdk.ViewState(
-        latitude=data.geometry.centroid.y.mean(),
-        longitude=data.geometry.centroid.x.mean(),
-        zoom=12
-    )
-
     # Render - EXACTLY AS BEFORE
     deck = pdk.Deck(layers=[layer], initial_view_state=view_state, tooltip=tooltip, map_style="light")
     st.pydeck_chart(deck)
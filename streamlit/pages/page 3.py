@@ -1,6 +1,6 @@
 import streamlit as st
 import matplotlib.pyplot as plt
-from db import Cassandra
+from db import connect, join_roads, calc_pci
 import plotly.express as px
 import pandas as pd
 import numpy as np
@@ -38,7 +38,7 @@ simple_header("Road Infrastructure Analysis", "Crack distribution across bridges
 # Initialize Cassandra connection
 @st.cache_resource
 def get_cassandra():
-    return Cassandra()
+    return connect()
 
 cassandra = get_cassandra()
 
@@ -79,35 +79,11 @@ st.markdown("""
 
 # Query with current filters
 if current_filters['districts'] and current_filters['start_date'] and current_filters['end_date']:
-    dists_filter = ", ".join([f"'{d}'" for d in current_filters['districts']])
-    start_iso = f"{current_filters['start_date'].isoformat()} 00:00:00"
-    end_iso = f"{current_filters['end_date'].isoformat()} 23:59:59"
-    
-    # First, let's see what columns we have in the crack table
-    cassandra.exec(f"""
-        SELECT column_name 
-        FROM system_schema.columns 
-        WHERE keyspace_name = 'default' AND table_name = 'crack'
-    """)
-    crack_columns = cassandra.data['column_name'].tolist() if not cassandra.data.empty else []
-    
-    # Now get the data with all available columns
-    query = f"""
-        SELECT * 
-        FROM crack 
-        WHERE dist IN ({dists_filter}) 
-        AND confidence >= {current_filters['confidence']}
-        AND timestamp >= '{start_iso}' 
-        AND timestamp <= '{end_iso}' 
-        ALLOW FILTERING
-    """
-    
-    cassandra.exec(query)
-    df = cassandra.join_roads()
+    # Crack counts per road and label (crack_rollup) with the road attributes
+    df = join_roads(cassandra.exec_rollup(current_filters))
 else:
-    # Fallback to original query
-    cassandra.exec("SELECT road_index, label FROM crack")
-    df = cassandra.join_roads()
+    # Fallback to original query (one crack per row)
+    df = join_roads(cassandra.exec_all("road_index, label")).assign(cracks=1)
 
 # Check if bridge/tunnel columns exist
 if 'bridge' not in df.columns or 'tunnel' not in df.columns:
@@ -129,7 +105,7 @@ if 'bridge' not in df.columns or 'tunnel' not in df.columns:
             
             for i, road_class in enumerate(road_classes):
                 if i < 3:  # Show up to 3 columns
-                    class_data = df[df['fclass'] == road_class].groupby('label').size().rename('count').sort_values(ascending=False)
+                    class_data = df[df['fclass'] == road_class].groupby('label')['cracks'].sum().rename('count').sort_values(ascending=False)
                     
                     with [col1, col2, col3][i]:
                         if not class_data.empty:
@@ -159,7 +135,7 @@ if 'bridge' not in df.columns or 'tunnel' not in df.columns:
         # Just show overall crack distribution
         st.markdown("### Overall Crack Distribution")
         if not df.empty and 'label' in df.columns:
-            overall = df.groupby('label').size().rename('count').sort_values(ascending=False)
+            overall = df.groupby('label')['cracks'].sum().rename('count').sort_values(ascending=False)
             
             df_plot = overall.reset_index()
             df_plot.columns = ['Crack Type', 'Count']
@@ -184,9 +160,9 @@ if 'bridge' not in df.columns or 'tunnel' not in df.columns:
 else:
     # Original code - bridge/tunnel columns exist
     # Group by label - EXACTLY AS BEFORE
-    bridge = df[df['bridge'] == 'T'].groupby('label').size().rename('count').sort_values(ascending=False)
-    tunnel = df[df['tunnel'] == 'T'].groupby('label').size().rename('count').sort_values(ascending=False)
-    normal = df[(df['bridge'] == 'F') & (df['tunnel'] == 'F')].groupby('label').size().rename('count').sort_values(ascending=False)
+    bridge = df[df['bridge'] == 'T'].groupby('label')['cracks'].sum().rename('count').sort_values(ascending=False)
+    tunnel = df[df['tunnel'] == 'T'].groupby('label')['cracks'].sum().rename('count').sort_values(ascending=False)
+    normal = df[(df['bridge'] == 'F') & (df['tunnel'] == 'F')].groupby('label')['cracks'].sum().rename('count').sort_values(ascending=False)
 
     # Helper to create horizontal bar chart - EXACTLY AS BEFORE
     def plot_hbar(series, title):
@@ -232,30 +208,10 @@ st.markdown("---")
 
 # Query with current filters for PCI data
 if current_filters['districts'] and current_filters['start_date'] and current_filters['end_date']:
-    dists_filter = ", ".join([f"'{d}'" for d in current_filters['districts']])
-    start_iso = f"{current_filters['start_date'].isoformat()} 00:00:00"
-    end_iso = f"{current_filters['end_date'].isoformat()} 23:59:59"
-    
-    query = f"""
-        SELECT x1,x2,y1,y2, road_index, label, ppm 
-        FROM crack 
-        WHERE dist IN ({dists_filter}) 
-        AND confidence >= {current_filters['confidence']}
-        AND timestamp >= '{start_iso}' 
-        AND timestamp <= '{end_iso}' 
-        ALLOW FILTERING
-    """
-    
-    cassandra.exec(query)
-    cassandra.join_roads()
-    cassandra.calc_pci()
-    df = cassandra.data
+    df = cassandra.exec_pci("x1,x2,y1,y2, road_index, label, ppm", current_filters)
 else:
     # Fallback to original query
-    cassandra.exec("SELECT x1,x2,y1,y2, road_index, label, ppm FROM crack")
-    cassandra.join_roads()
-    cassandra.calc_pci()
-    df = cassandra.data
+    df = calc_pci(join_roads(cassandra.exec_all("x1,x2,y1,y2, road_index, label, ppm")))
 
 # Check if we have the required columns
 if df.empty:
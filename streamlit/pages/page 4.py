@@ -1,5 +1,5 @@
 import streamlit as st
-from db import Cassandra
+from db import connect, join_roads, calc_pci
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
@@ -36,7 +36,7 @@ simple_header("Historical PCI Analysis", "Pavement Condition Index trends over t
 # Initialize Cassandra connection
 @st.cache_resource
 def get_cassandra():
-    return Cassandra()
+    return connect()
 
 cassandra = get_cassandra()
 
@@ -71,30 +71,10 @@ with st.expander("📋 Current Filter Summary", expanded=False):
 
 # Query with current filters
 if current_filters['districts'] and current_filters['start_date'] and current_filters['end_date']:
-    dists_filter = ", ".join([f"'{d}'" for d in current_filters['districts']])
-    start_iso = f"{current_filters['start_date'].isoformat()} 00:00:00"
-    end_iso = f"{current_filters['end_date'].isoformat()} 23:59:59"
-    
-    query = f"""
-        SELECT x1,x2,y1,y2, road_index, label, ppm, timestamp 
-        FROM crack 
-        WHERE dist IN ({dists_filter}) 
-        AND confidence >= {current_filters['confidence']}
-        AND timestamp >= '{start_iso}' 
-        AND timestamp <= '{end_iso}' 
-        ALLOW FILTERING
-    """
-    
-    cassandra.exec(query)
-    cassandra.join_roads()
-    cassandra.calc_pci()
-    data = cassandra.data.copy()
+    data = cassandra.exec_pci("x1,x2,y1,y2, road_index, label, ppm, timestamp", current_filters)
 else:
     # Fallback to original query
-    cassandra.exec("SELECT x1,x2,y1,y2, road_index, label, ppm, timestamp FROM crack")
-    cassandra.join_roads()
-    cassandra.calc_pci()
-    data = cassandra.data.copy()
+    data = calc_pci(join_roads(cassandra.exec_all("x1,x2,y1,y2, road_index, label, ppm, timestamp")))
 
 # Check if we have data
 if data.empty:
@@ -1,5 +1,5 @@
 import streamlit as st
-from db import Cassandra
+from db import connect, join_roads
 import matplotlib.pyplot as plt
 import plotly.graph_objects as go
 import plotly.express as px
@@ -29,7 +29,7 @@ cmap = plt.get_cmap('Dark2')
 simple_header("Road Characteristics Analysis", "Crack distribution by road speed limits and one-way vs both directions", "🚦")
 
 # Initialize Cassandra connection
-cassandra = Cassandra()
+cassandra = connect()
 
 # Initialize Filter Manager
 filter_manager = FilterManager(cassandra)
@@ -65,36 +65,19 @@ st.markdown("##### 🚦 Comparison between different road speeds")
 
 # Query with current filters
 if current_filters['districts'] and current_filters['start_date'] and current_filters['end_date']:
-    dists_filter = ", ".join([f"'{d}'" for d in current_filters['districts']])
-    start_iso = f"{current_filters['start_date'].isoformat()} 00:00:00"
-    end_iso = f"{current_filters['end_date'].isoformat()} 23:59:59"
-    
-    query = f"""
-        SELECT label, road_index 
-        FROM crack 
-        WHERE dist IN ({dists_filter}) 
-        AND confidence >= {current_filters['confidence']}
-        AND timestamp >= '{start_iso}' 
-        AND timestamp <= '{end_iso}' 
-        ALLOW FILTERING
-    """
-    
-    cassandra.exec(query)
-    cassandra.join_roads()
-    cracks_df = cassandra.data
+    # Crack counts per road and label (crack_rollup) with the road attributes
+    joined_df = join_roads(cassandra.exec_rollup(current_filters))
 else:
-    # Fallback to original query
-    cassandra.exec("SELECT label, road_index FROM crack")
-    cassandra.join_roads()
-    cracks_df = cassandra.data
+    # Fallback to original query (one crack per row)
+    joined_df = join_roads(cassandra.exec_all("label, road_index")).assign(cracks=1)
 
 # Filter valid speeds - EXACTLY AS BEFORE
-cracks_df = cracks_df[cracks_df['maxspeed'] > 0]
+cracks_df = joined_df[joined_df['maxspeed'] > 0]
 
 # Group by maxspeed and crack type - EXACTLY AS BEFORE
 speed_cracks = (
-    cracks_df.groupby(["maxspeed", "label"])
-    .size()
+    cracks_df.groupby(["maxspeed", "label"])["cracks"]
+    .sum()
     .reset_index(name="count")
 )
 
@@ -111,7 +94,7 @@ pivot_long = pivot_speed.reset_index().melt(
 )
 
 # Total counts for annotation - EXACTLY AS BEFORE
-total_counts = cracks_df.groupby('maxspeed').size().sort_index()
+total_counts = cracks_df.groupby('maxspeed')['cracks'].sum().sort_index()
 
 # Map colors to your professional palette - EXACTLY AS BEFORE
 color_map = {k: v for k, v in zip(pivot_long['Crack Type'].unique(), DASHBOARD_PALETTE)}
@@ -156,10 +139,10 @@ st.plotly_chart(fig, use_container_width=True)
 
 
 st.markdown("##### 🔄 One way roads vs both")
-df = cassandra.data
+df = joined_df
 
-oneway_B = df[df['oneway'] == 'B'].groupby('label').size()
-oneway_F = df[df['oneway'] == 'F'].groupby('label').size()
+oneway_B = df[df['oneway'] == 'B'].groupby('label')['cracks'].sum()
+oneway_F = df[df['oneway'] == 'F'].groupby('label')['cracks'].sum()
 
 
 categories_B = oneway_B.index
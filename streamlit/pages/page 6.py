@@ -6,9 +6,9 @@ from google import genai
 from google.genai import types
 from dotenv import load_dotenv
 import time
-from db import Cassandra
+from db import connect, join_roads
 
-cassandra = Cassandra()
+cassandra = connect()
 
 # --- PAGE CONFIG & GLOBAL AVATAR REMOVAL ---
 st.set_page_config(page_title="PavementEye Brain", layout="wide")
@@ -364,8 +364,7 @@ def load_knowledge_base():
         print(f"⚠️ README not found at: {readme_path}")
 
     # 3. Load Database
-    cassandra.exec("SELECT * FROM crack")
-    database = cassandra.join_roads()
+    database = join_roads(cassandra.exec_all("*"))
     context += "\n\n--- DATABASE CONTENT ---\n" + str(database)
     
     return context
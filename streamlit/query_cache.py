@@ -0,0 +1,95 @@
+# Filtered crack data shared by every page and every session of the dashboard
+# One entry per (districts, confidence, date range) holds all the columns, pages get
+# their columns from it instead of querying cassandra again.
+# Entries expire after a TTL, the least recently used go first when the cache is full,
+# and new cracks (seen through crack_meta.updated_at) drop only the entries of their district.
+import time
+import threading
+from collections import OrderedDict
+
+QUERY_CACHE_SIZE = 16          # entries
+QUERY_CACHE_TTL_S = 300        # same as the filter options cache
+QUERY_CACHE_CHECK_S = 10       # how often to look for new cracks
+
+def cache_key(filters):
+    """Normalized filters: district order does not matter"""
+    return (
+        tuple(sorted(set(filters['districts']))),
+        round(float(filters['confidence']), 4),
+        filters['start_date'],
+        filters['end_date'],
+    )
+
+class QueryCache:
+    def __init__(self, max_entries=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL_S, check_interval=QUERY_CACHE_CHECK_S):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.entries = OrderedDict()   # key -> (time stored, DataFrame)
+        self.last_update = {}          # district -> newest crack_meta.updated_at seen
+        self.last_check = 0.0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, data):
+        with self._lock:
+            self.entries[key] = (time.monotonic(), data)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, dists):
+        """Drop the entries that include any of the districts"""
+        dists = set(dists)
+        with self._lock:
+            for key in [k for k in self.entries if dists & set(k[0])]:
+                del self.entries[key]
+
+    def refresh(self, cassandra, dists=()):
+        """
+        Invalidate the districts that got new cracks (at most once per check_interval).
+        dists about to be fetched are tracked right away, so cracks that arrive after
+        the fetch are noticed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            to_check = {d for d in dists if d not in self.last_update}
+            if now - self.last_check >= self.check_interval:
+                self.last_check = now
+                to_check |= {d for key in self.entries for d in key[0]}
+
+        changed = []
+        for dist in sorted(to_check):
+            newest = cassandra.newest_update(dist)
+            if newest is None:
+                continue
+            if dist in self.last_update and newest > self.last_update[dist]:
+                changed.append(dist)
+            self.last_update[dist] = newest
+
+        if changed:
+            self.invalidate(changed)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_mb": round(float(sum(d.memory_usage(deep=True).sum() for _, d in self.entries.values())) / 1e6, 2),
+            }
+
+# one cache per streamlit process
+query_cache = QueryCache()
@@ -0,0 +1,81 @@
+# Road layer shared by every page of the dashboard
+# Loaded once per process (streamlit reruns pages, not the process) and
+# reloaded only when the source file changes.
+# The GeoDataFrame is shared: treat it as read-only (merge/copy before changing it).
+import os
+import sys
+import hashlib
+import threading
+import geopandas as gpd
+
+sys.path.append('../scripts')
+from road_index import RoadIndex, ROADS_GEOJSON, ROADS_INDEX
+
+_lock = threading.Lock()
+_roads = None      # GeoDataFrame indexed by road_index
+_source = None     # (path, mtime_ns, size, sha1) of the loaded file
+_loads = 0
+
+def _source_path():
+  # prebuilt artifact (scripts/road_index.py) if there is one, geojson otherwise
+  return ROADS_INDEX if os.path.exists(ROADS_INDEX) else ROADS_GEOJSON
+
+def _file_hash(path):
+  h = hashlib.sha1()
+  with open(path, 'rb') as f:
+    for chunk in iter(lambda: f.read(1 << 20), b''):
+      h.update(chunk)
+  return h.hexdigest()
+
+def _load(path):
+  if path == ROADS_INDEX:
+    # memory mapped instead of parsing the geojson
+    roads_df = RoadIndex.load(path).to_geodataframe()
+  else:
+    roads_df = gpd.read_file(path).to_crs(epsg=4326)
+    roads_df['road_index'] = roads_df.index
+  roads_df.index.name = None
+  return roads_df
+
+def get_roads():
+  """Shared road GeoDataFrame (EPSG:4326) with a road_index column"""
+  global _roads, _source, _loads
+
+  path = _source_path()
+  stat = os.stat(path)
+
+  with _lock:
+    if _source is not None and _source[:3] == (path, stat.st_mtime_ns, stat.st_size):
+      return _roads
+
+    # mtime changed: only reload when the content really changed (e.g. not for a touch or a copy)
+    digest = _file_hash(path)
+    if _source is not None and _source[0] == path and _source[3] == digest:
+      _source = (path, stat.st_mtime_ns, stat.st_size, digest)
+      return _roads
+
+    _roads = _load(path)
+    _source = (path, stat.st_mtime_ns, stat.st_size, digest)
+    _loads += 1
+
+    print(f"✅ Road layer loaded from {path}: {len(_roads)} roads, {roads_memory_mb():.1f} MB")
+    return _roads
+
+def roads_memory_mb():
+  """Memory used by the cached road layer (attributes and geometries) in MB"""
+  if _roads is None:
+    return 0.0
+  attributes = _roads.drop(columns='geometry').memory_usage(deep=True).sum()
+  # shapely does not expose geometry sizes, WKB size is a close estimate
+  geometries = _roads.geometry.to_wkb().str.len().sum()
+  return (attributes + geometries) / 1e6
+
+def roads_stats():
+  """Info about the cached road layer"""
+  with _lock:
+    return {
+      "source": _source[0] if _source else None,
+      "roads": 0 if _roads is None else len(_roads),
+      "loads": _loads,
+      "memory_mb": round(roads_memory_mb(), 2),
+    }
@@ -0,0 +1,113 @@
+# Snapshot mode of the dashboard (DASHBOARD_SOURCE=snapshot)
+# Reads the Parquet snapshot written by scripts/snapshot_export.py instead of cassandra,
+# with the same methods as the Cassandra class so the pages work with either.
+# Only the needed columns are read (column pruning), and the district, month,
+# date and confidence filters skip partitions / row groups (predicate pushdown).
+import os
+from datetime import datetime, time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from db import join_roads, calc_pci, calc_road_pci
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "../data/snapshot/crack")
+
+# hive partitions written by scripts/snapshot_export.py: dist=<dist>/month=<YYYY-MM>
+PARTITIONING = ds.partitioning(pa.schema([('dist', pa.string()), ('month', pa.string())]), flavor='hive')
+
+class Snapshot:
+  def __init__(self, path=SNAPSHOT_DIR):
+    self.path = path
+    print(f"Reading the crack snapshot in {os.path.abspath(path)}")
+
+  def dataset(self):
+    # opened on every read: the exporter swaps in a new snapshot directory
+    return ds.dataset(self.path, format='parquet', partitioning=PARTITIONING)
+
+  def read(self, columns, filter=None):
+    """Columns ("a, b" or "*") of the cracks matching the filter expression as a DataFrame"""
+    try:
+      dataset = self.dataset()
+      if columns.strip() == '*':
+        names = [n for n in dataset.schema.names if n != 'month']
+      else:
+        names = [c.strip() for c in columns.split(',')]
+
+      return dataset.to_table(columns=names, filter=filter).to_pandas()
+    except:
+      return "Error in the snapshot query"
+
+  @staticmethod
+  def filter_expression(filters):
+    """Dashboard filters (districts, confidence, start_date, end_date) as a pyarrow expression"""
+    start = datetime.combine(filters['start_date'], time(0, 0, 0))
+    end = datetime.combine(filters['end_date'], time(23, 59, 59))
+    months = pd.period_range(filters['start_date'], filters['end_date'], freq='M').strftime('%Y-%m').tolist()
+
+    # dist and month only select partitions, timestamp and confidence use the row group statistics
+    return ds.field('dist').isin(list(filters['districts'])) \
+      & ds.field('month').isin(months) \
+      & (ds.field('timestamp') >= pa.scalar(start, type=pa.timestamp('ms'))) \
+      & (ds.field('timestamp') <= pa.scalar(end, type=pa.timestamp('ms'))) \
+      & (ds.field('confidence') >= float(filters['confidence']))
+
+  def exec(self, query, params=None):
+    # the snapshot has no query language, use the methods below
+    return "Error in the snapshot query: CQL queries need DASHBOARD_SOURCE=cassandra"
+
+  def exec_all(self, columns):
+    """Columns of every crack (no filters)"""
+    return self.read(columns)
+
+  def exec_filtered(self, columns, filters):
+    """Cracks matching the dashboard filters (newest first), only the given columns ("*" for all)"""
+    data = self.read(columns, self.filter_expression(filters))
+    if isinstance(data, pd.DataFrame) and 'timestamp' in data.columns:
+      data = data.sort_values('timestamp', ascending=False, ignore_index=True)
+    return data
+
+  def exec_pci(self, columns, filters):
+    """Cracks matching the dashboard filters with the pci and condition of their road"""
+    return calc_pci(join_roads(self.exec_filtered(columns, filters)))
+
+  def exec_road_pci(self, filters):
+    """One row per road with the pci, condition and number of the cracks matching the dashboard filters"""
+    return calc_road_pci(self.exec_filtered("x1,x2,y1,y2, road_index, label, ppm", filters))
+
+  def exec_rollup(self, filters):
+    """Crack counts (cracks) and areas (area_m2) per road_index and label, like the crack_rollup table"""
+    data = self.read("road_index, label, x1, x2, y1, y2, ppm", self.filter_expression(filters))
+    if not isinstance(data, pd.DataFrame) or data.empty:
+      return data
+
+    area = (data['x2'] - data['x1']).abs() * (data['y2'] - data['y1']).abs() / (data['ppm'] * data['ppm'])
+    return data[['road_index', 'label']].assign(cracks=1, area_m2=area)\
+      .groupby(['road_index', 'label'], as_index=False)[['cracks', 'area_m2']].sum()
+
+  def newest_update(self, dist):
+    # a snapshot does not change while it is read
+    return None
+
+  def road_pci(self, dists):
+    """PCI of every road in the districts from all their cracks (like the road_pci table)"""
+    data = self.read("x1, x2, y1, y2, road_index, label, ppm", ds.field('dist').isin(list(dists)))
+    if not isinstance(data, pd.DataFrame):
+      return pd.DataFrame()
+
+    data = data[data['road_index'] != -1]
+    if data.empty:
+      return pd.DataFrame()
+
+    return calc_road_pci(data)
+
+  def filter_options(self):
+    """Districts, confidence range and date range of all the cracks"""
+    data = self.read("dist, confidence, timestamp")
+
+    return {
+      'districts': data['dist'].unique().tolist() if not data.empty else [],
+      'min_confidence': float(data['confidence'].min()),
+      'max_confidence': float(data['confidence'].max()),
+      'min_date': pd.to_datetime(data['timestamp'].min()).date(),
+      'max_date': pd.to_datetime(data['timestamp'].max()).date()
+    }
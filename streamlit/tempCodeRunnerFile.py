@@ -1,5 +1,5 @@
 import streamlit as st
-from db import Cassandra
+from db import Cassandra, join_roads
 import matplotlib.pyplot as plt
 import plotly.express as px
 import numpy as np
@@ -16,8 +16,7 @@ local_css("style.css")
 # ---------------------------------------------------------------------------------
 
 cassandra = Cassandra()
-cassandra.exec("SELECT * FROM crack LIMIT 10")
-data = cassandra.join_roads()
+data = join_roads(cassandra.exec("SELECT * FROM crack LIMIT 10"))
 data = data.drop(['geometry', 'index', 'road_index', 'id'], axis=1)
 
 st.title("Pavement eye 🛣️")
@@ -46,8 +45,7 @@ with col1:
   ax.pie(plot, labels=plot.index, autopct='%.2f%%', colors=colors)
   st.pyplot(fig)
 # -----------------------------------------------------------------------------------
-cassandra.exec("SELECT road_index, label FROM crack")
-data2 = cassandra.join_roads()
+data2 = join_roads(cassandra.exec("SELECT road_index, label FROM crack"))
 
 grouped_df = data2.groupby(["fclass", "label"]).size().reset_index(name='count')
 
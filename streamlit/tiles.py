@@ -0,0 +1,149 @@
+# Map tiles of the dashboard: what the pydeck maps get instead of every crack / full road
+#   - cracks are binned into quadkey cells (web mercator tiles) a few pixels wide at
+#     the map zoom, one row per cell (count, mean confidence, main label, ...)
+#   - road geometries are simplified to half a pixel at the map zoom (cached per zoom)
+# Streamlit does not send the pydeck view back to python, so the pages cannot know where
+# the user pans: they send all the (binned / simplified) data and open the map on its
+# bounds (see fit_view). crack_cells / road_layer can still crop to a known viewport.
+import threading
+import numpy as np
+import pandas as pd
+import shapely
+import geopandas as gpd
+from roads import get_roads
+
+TILE_SIZE = 256          # px of a web mercator tile
+CELL_LEVELS = 6          # cells are 4 px at the map zoom (256 / 2**6)
+DETAIL_ZOOM = 18         # from this zoom the cracks are sent one by one
+MAP_WIDTH = 1200         # px, about the width of a streamlit wide page
+MAP_HEIGHT = 500         # px, pydeck chart height
+VIEWPORT_MARGIN = 1.0    # screens sent around the viewport (for panning)
+MAX_LAT = 85.05112878    # web mercator limit
+
+_lock = threading.Lock()
+_simplified = {}         # zoom -> simplified road geometries (indexed by road_index)
+_simplified_roads = None # road layer the cache was built from
+
+def tile_xy(lon, lat, zoom):
+  """Fractional web mercator tile coordinates of lon / lat (arrays) at a zoom level"""
+  n = 2.0 ** zoom
+  lat = np.radians(np.clip(np.asarray(lat, dtype=float), -MAX_LAT, MAX_LAT))
+  x = (np.asarray(lon, dtype=float) + 180.0) / 360.0 * n
+  y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * n
+  return x, y
+
+def tile_lonlat(x, y, zoom):
+  """lon / lat of fractional tile coordinates (inverse of tile_xy)"""
+  n = 2.0 ** zoom
+  lon = np.asarray(x, dtype=float) / n * 360.0 - 180.0
+  lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * np.asarray(y, dtype=float) / n))))
+  return lon, lat
+
+def quadkeys(x, y, zoom):
+  """Quadkeys (Bing maps tile names) of integer tile coordinates (arrays)"""
+  x = np.asarray(x, dtype=np.int64)
+  y = np.asarray(y, dtype=np.int64)
+  if zoom == 0:
+    return np.full(len(x), '', dtype=object)
+  # one digit per level (most significant first), as ascii bytes viewed as one string per tile
+  digits = np.stack([((x >> b) & 1) + 2 * ((y >> b) & 1) for b in range(zoom - 1, -1, -1)], axis=-1)
+  return np.ascontiguousarray(digits + ord('0'), dtype=np.uint8).view(f'S{zoom}').ravel().astype(str).astype(object)
+
+def degrees_per_pixel(zoom):
+  """Longitude degrees covered by one pixel at a zoom level"""
+  return 360.0 / (TILE_SIZE * 2 ** zoom)
+
+def viewport(lat, lon, zoom, width=MAP_WIDTH, height=MAP_HEIGHT, margin=VIEWPORT_MARGIN):
+  """(minx, miny, maxx, maxy) lon / lat box seen around a center at a zoom (plus the margin)"""
+  x, y = tile_xy(lon, lat, zoom)
+  half_w = width / TILE_SIZE * (0.5 + margin)
+  half_h = height / TILE_SIZE * (0.5 + margin)
+  minx, maxy = tile_lonlat(x - half_w, y - half_h, zoom)
+  maxx, miny = tile_lonlat(x + half_w, y + half_h, zoom)
+  return float(minx), float(miny), float(maxx), float(maxy)
+
+def fit_view(minx, miny, maxx, maxy, width=MAP_WIDTH, height=MAP_HEIGHT, max_zoom=DETAIL_ZOOM):
+  """(lat, lon, zoom) of a map showing the whole lon / lat box (the largest zoom that fits)"""
+  x1, y1 = tile_xy(minx, maxy, 0)
+  x2, y2 = tile_xy(maxx, miny, 0)
+  lon, lat = tile_lonlat((x1 + x2) / 2, (y1 + y2) / 2, 0)
+
+  # a zoom level doubles the pixels of the box
+  span_x, span_y = float(x2 - x1) * TILE_SIZE, float(y2 - y1) * TILE_SIZE
+  zooms = [np.log2(size / span) for size, span in ((width, span_x), (height, span_y)) if span > 0]
+  zoom = int(np.clip(np.floor(min(zooms)), 0, max_zoom)) if zooms else max_zoom
+  return float(lat), float(lon), zoom
+
+def in_bbox(lon, lat, bbox):
+  minx, miny, maxx, maxy = bbox
+  return (lon >= minx) & (lon <= maxx) & (lat >= miny) & (lat <= maxy)
+
+def crack_cells(data, zoom, bbox=None):
+  """
+  Cracks (lon, lat, confidence, label, timestamp, image), only those of the bbox if
+  given, binned into quadkey cells at the map zoom: one row per cell at its center with the number of
+  cracks, their mean confidence, the most frequent label, the latest timestamp and
+  the image of the most confident crack. From DETAIL_ZOOM the cracks are not binned.
+  weight is the summed confidence of the cell, the heatmap weight of its cracks.
+  """
+  if bbox is not None:
+    data = data[in_bbox(data['lon'], data['lat'], bbox)]
+  if zoom >= DETAIL_ZOOM or data.empty:
+    return data.assign(cracks=1, weight=data['confidence'])
+
+  level = int(zoom) + CELL_LEVELS
+  x, y = tile_xy(data['lon'].to_numpy(), data['lat'].to_numpy(), level)
+  x, y = np.floor(x).astype(np.int64), np.floor(y).astype(np.int64)
+  cells = data.assign(cell=(x << level) | y)
+
+  result = cells.groupby('cell').agg(
+    cracks=('confidence', 'size'), confidence=('confidence', 'mean'), weight=('confidence', 'sum')
+  )
+
+  # most frequent label, latest timestamp and most confident image of every cell
+  # (first row of every cell after a sort, much faster than a per group max on strings)
+  labels = cells.groupby(['cell', 'label']).size().reset_index(name='n')\
+    .sort_values(['cell', 'n'], ascending=[True, False]).drop_duplicates('cell').set_index('cell')['label']
+  timestamps = cells.sort_values('timestamp', ascending=False).drop_duplicates('cell').set_index('cell')['timestamp']
+  images = cells.sort_values('confidence', ascending=False).drop_duplicates('cell').set_index('cell')['image']
+  result = result.assign(timestamp=timestamps, label=labels, image=images).reset_index()
+
+  cell_x, cell_y = result['cell'].to_numpy() >> level, result['cell'].to_numpy() & ((1 << level) - 1)
+  lon, lat = tile_lonlat(cell_x + 0.5, cell_y + 0.5, level)
+  return result.assign(lon=lon, lat=lat, quadkey=quadkeys(cell_x, cell_y, level), confidence=result['confidence'].round(3))\
+    .drop(columns='cell')
+
+def simplified_roads(zoom):
+  """Road geometries simplified to half a pixel at a zoom level (shared, indexed by road_index)"""
+  global _simplified_roads
+
+  roads = get_roads()
+  with _lock:
+    # the road layer was reloaded: simplify again
+    if roads is not _simplified_roads:
+      _simplified.clear()
+      _simplified_roads = roads
+
+    if zoom not in _simplified:
+      geometries = shapely.simplify(roads.geometry.to_numpy(), degrees_per_pixel(zoom) / 2, preserve_topology=False)
+      _simplified[zoom] = pd.Series(geometries, index=roads['road_index'].to_numpy())
+    return _simplified[zoom]
+
+def road_layer(data, zoom, bbox=None):
+  """
+  Roads of a joined frame (road_index, geometry, ...) with their geometry simplified
+  for the zoom, only the roads that cross the bbox if given
+  """
+  simplified = simplified_roads(zoom)
+  # cracks on no road (-1) or on a road missing from the layer have no geometry
+  data = data[data['road_index'].isin(simplified.index)]
+  geometries = simplified.reindex(data['road_index'].to_numpy()).to_numpy()
+  data = data.assign(geometry=gpd.GeoSeries(geometries, index=data.index, crs=data.crs))
+
+  if bbox is not None:
+    bounds = shapely.bounds(geometries)
+    minx, miny, maxx, maxy = bbox
+    inside = (bounds[:, 0] <= maxx) & (bounds[:, 2] >= minx) & (bounds[:, 1] <= maxy) & (bounds[:, 3] >= miny)
+    data = data[inside]
+
+  return data
@@ -2,6 +2,7 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
+from db import join_roads
 
 class FilterManager:
     def __init__(self, cassandra):
@@ -37,27 +38,7 @@ class FilterManager:
     def load_filter_options(_self):
         """Load available filter options from database"""
         try:
-            # Get distinct districts
-            dists = _self.cassandra.exec("SELECT DISTINCT dist FROM crack")
-            dists_list = dists.iloc[:, 0].unique().tolist() if not dists.empty else []
-            
-            # Get confidence range
-            conf_result = _self.cassandra.exec("SELECT max(confidence) as max_conf, min(confidence) as min_conf FROM crack")
-            min_conf = float(conf_result.iloc[0, 1])
-            max_conf = float(conf_result.iloc[0, 0])
-            
-            # Get date range
-            date_result = _self.cassandra.exec("SELECT max(timestamp) as max_ts, min(timestamp) as min_ts FROM crack")
-            max_date = pd.to_datetime(date_result.iloc[0, 0]).date()
-            min_date = pd.to_datetime(date_result.iloc[0, 1]).date()
-            
-            return {
-                'districts': dists_list,
-                'min_confidence': min_conf,
-                'max_confidence': max_conf,
-                'min_date': min_date,
-                'max_date': max_date
-            }
+            return _self.cassandra.filter_options()
         except Exception as e:
             st.error(f"Error loading filter options: {e}")
             return {
@@ -190,8 +171,14 @@ class FilterManager:
         """Get available filter options"""
         return st.session_state.filter_options.copy()
     
-    def get_filtered_data(self):
-        """Get data filtered by current filters"""
+    def get_filtered_data(self, columns=None, road_columns=None, geometry=False):
+        """
+        Get data filtered by current filters
+
+        columns: crack columns to fetch (all by default)
+        road_columns: road attributes to join (all by default, [] for no join)
+        geometry: join the road geometry too (a GeoDataFrame, only for maps)
+        """
         filters = self.get_current_filters()
         
         if not filters['districts']:
@@ -202,24 +189,18 @@ class FilterManager:
             st.warning("Please select both start and end dates")
             return None
         
-        # Build query
-        dists_filter = ", ".join([f"'{d}'" for d in filters['districts']])
-        start_iso = f"{filters['start_date'].isoformat()} 00:00:00"
-        end_iso = f"{filters['end_date'].isoformat()} 23:59:59"
-        
-        query = f"""
-            SELECT * FROM crack 
-            WHERE dist IN ({dists_filter}) 
-            AND confidence >= {filters['confidence']}
-            AND timestamp >= '{start_iso}' 
-            AND timestamp <= '{end_iso}' 
-            ALLOW FILTERING
-        """
+        join = geometry or road_columns != []
+        fetch = None if columns is None else list(columns) + (['road_index'] if join and 'road_index' not in columns else [])
         
-        self.cassandra.exec(query)
-        data = self.cassandra.join_roads()
+        # Query (bounded dist/day partitions), only the needed columns
+        data = self.cassandra.exec_filtered("*" if fetch is None else ", ".join(fetch), filters)
+        if join:
+            data = join_roads(data, road_columns, geometry)
         
-        # Drop unnecessary columns if they exist
-        columns_to_drop = ['geometry', 'index', 'road_index', 'id']
+        # Drop unnecessary columns if they exist (the ones not asked for)
+        if columns is None:
+            columns_to_drop = ['index', 'road_index', 'id', 'day']
+        else:
+            columns_to_drop = ['index'] + [col for col in fetch if col not in columns]
         columns_to_drop = [col for col in columns_to_drop if col in data.columns]
-        return data.drop(columns=columns_to_drop, errors='ignore')
\ No newline at end of file
+        return data.drop(columns=columns_to_drop, errors='ignore')